@@ -1,12 +1,26 @@
 from .dispatcher import Dispatcher
 from .context import Context, pass_context, get_current_context, get_current_executor
 from .exceptions import TaskError
-from .executor import Executor, InteractiveWarningPolicy
+from .executor import Executor
 from .groups import Task, Group, RootCommand, StackGroup, StageGroup, root, task, group
-from .utils import append_cmd_flags, confirm_and_apply, invoke_tree, load_config_file, normalize_config, set_up_file_transfer_listeners, wait_for
-from . import docker, filters, libs, tasks
+from .utils import append_cmd_args, append_cmd_flags, confirm_and_apply, invoke_tree, load_config_file, normalize_config, parallel_map, set_up_file_transfer_listeners, wait_for
 
-from . import ansible_actions, git_actions
+# These submodules are imported on first access (see __getattr__ below) as some
+# of them pull heavy dependencies (e.g. boto3) that most tasks never use.
+_lazy_submodules = {
+    'ansible_actions',
+    'docker',
+    'filters',
+    'git_actions',
+    'libs',
+    'tasks',
+}
+
+# Same goes for these attributes, mapped to the submodule defining them, as
+# they depend on paramiko which is only needed by remote executors.
+_lazy_attributes = {
+    'InteractiveWarningPolicy': 'ssh',
+}
 
 __all__ = [
     #  from dispatcher module
@@ -34,11 +48,13 @@ __all__ = [
     'group',
 
     # from utils module
+    'append_cmd_args',
     'append_cmd_flags',
     'confirm_and_apply',
     'invoke_tree',
     'load_config_file',
     'normalize_config',
+    'parallel_map',
     'set_up_file_transfer_listeners',
     'wait_for',
 
@@ -51,3 +67,19 @@ __all__ = [
     'libs',
     'tasks',
 ]
+
+
+def __getattr__(name: str):
+    import importlib
+
+    if name in _lazy_attributes:
+        module = importlib.import_module('.' + _lazy_attributes[name],
+                                         __name__)
+        value = getattr(module, name)
+    elif name in _lazy_submodules:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    globals()[name] = value
+    return value
@@ -1,6 +1,9 @@
 from kitipy import Context
+import itertools
 import os
-from typing import Optional, Tuple
+import tempfile
+import yaml
+from typing import List, NamedTuple, Optional, Tuple
 
 
 def galaxy_install(kctx: Context,
@@ -19,11 +22,11 @@ def galaxy_install(kctx: Context,
         force (bool):
             Whehter ``--force`` flag should be added to ``ansible-galaxy`` command.
     """
-    kctx.run('ansible-galaxy install -r %s -p %s %s' % (
-        file,
-        dest,
-        '--force' if force else '',
-    ))
+    args = ['ansible-galaxy', 'install', '-r', file, '-p', dest]
+    if force:
+        args.append('--force')
+
+    kctx.run(args, shell=False)
 
 
 def run_playbook(kctx: Context,
@@ -31,7 +34,9 @@ def run_playbook(kctx: Context,
                  playbook: str,
                  hosts: Optional[Tuple[str]] = None,
                  tags: Optional[Tuple[str]] = None,
-                 ask_become_pass: bool = False):
+                 ask_become_pass: bool = False,
+                 forks: Optional[int] = None,
+                 pipelining: bool = True):
     """Run a given Ansible playbook using ``ansible-playbook``.
 
     Args:
@@ -48,15 +53,115 @@ def run_playbook(kctx: Context,
         ask_become_pass (bool):
             Whether ``--ask-become-pass`` should be added to the ``ansible-playbook``
             command.
+        forks (Optional[int]):
+            Number of hosts Ansible should manage in parallel (``--forks``). Use
+            None to keep the value from your Ansible config (default value).
+        pipelining (bool):
+            Whether Ansible should pipe modules through its SSH connections
+            rather than uploading them first. This saves an SFTP transfer per
+            task and is enabled by default, unless ``ANSIBLE_PIPELINING`` env
+            var is already set. Note that it requires ``requiretty`` to be
+            disabled in sudoers of the targeted hosts.
     """
-    cmd = 'ansible-playbook -i %s' % (inventory)
+    args = ['ansible-playbook', '-i', inventory]
     if hosts is not None and len(hosts) > 0:
-        cmd += ' -l ' + ','.join(hosts)
+        args.extend(['-l', ','.join(hosts)])
     if tags is not None and len(tags) > 0:
-        cmd += ' -t ' + ','.join(tags)
+        args.extend(['-t', ','.join(tags)])
     if ask_become_pass:
-        cmd += ' --ask-become-pass'
+        args.append('--ask-become-pass')
+    if forks is not None:
+        args.extend(['-f', str(forks)])
+
+    args.append(playbook)
+
+    env = None
+    if pipelining and 'ANSIBLE_PIPELINING' not in os.environ:
+        env = dict(os.environ, ANSIBLE_PIPELINING='1')
+
+    kctx.local(args, env=env, shell=False)
+
+
+class Play(NamedTuple):
+    """Play describes a playbook run, as executed by run_playbooks().
+
+    Attributes:
+        playbook (str):
+            Path to the Ansible playbook to run.
+        hosts (Optional[Tuple[str]]):
+            List of targeted hosts. Use None to target all hosts (default value).
+        tags (Optional[Tuple[str]]):
+            List of targeted tags. Use None to apply all the tags (default value).
+    """
+    playbook: str
+    hosts: Optional[Tuple[str, ...]] = None
+    tags: Optional[Tuple[str, ...]] = None
+
 
-    cmd += ' ' + playbook
+def run_playbooks(kctx: Context,
+                  inventory: str,
+                  plays: List[Play],
+                  ask_become_pass: bool = False,
+                  forks: Optional[int] = None,
+                  pipelining: bool = True):
+    """Run a list of Ansible playbooks with as few ``ansible-playbook`` calls
+    as possible.
+
+    Consecutive plays targeting the same hosts and tags are run through a
+    single ``ansible-playbook`` call, using a temporary playbook importing
+    each of them (with ``import_playbook``). As such, the inventory is loaded
+    only once per group of plays. Plays are still run in the given order and
+    the first failing playbook stops the whole run, as it would if
+    run_playbook() was called for each of them.
+
+    Args:
+        kctx (kitipy.Context):
+            Context to use to run the playbooks.
+        inventory (str):
+            Path to Ansible host inventory.
+        plays (List[Play]):
+            The playbooks to run, with their targeted hosts and tags.
+        ask_become_pass (bool):
+            Whether ``--ask-become-pass`` should be added to the
+            ``ansible-playbook`` commands.
+        forks (Optional[int]):
+            See run_playbook().
+        pipelining (bool):
+            See run_playbook().
+    """
+    key = lambda play: (tuple(play.hosts or ()), tuple(play.tags or ()))
+
+    for (hosts, tags), group in itertools.groupby(plays, key=key):
+        playbooks = [play.playbook for play in group]
+
+        if len(playbooks) == 1:
+            run_playbook(kctx, inventory, playbooks[0], hosts, tags,
+                         ask_become_pass, forks, pipelining)
+            continue
+
+        path = _write_import_playbook(kctx, playbooks)
+        try:
+            run_playbook(kctx, inventory, path, hosts, tags,
+                         ask_become_pass, forks, pipelining)
+        finally:
+            os.unlink(path)
+
+
+def _write_import_playbook(kctx: Context, playbooks: List[str]) -> str:
+    """Write a temporary playbook importing all the given playbooks and return
+    its path. It's the caller responsibility to remove it once it's not used
+    anymore.
+    """
+    # Imported playbooks are resolved relatively to the importing playbook,
+    # which lives in the temp dir, thus paths have to be absolute.
+    basedir = kctx.local_cwd or os.getcwd()
+    imports = [{
+        'import_playbook': os.path.join(basedir, playbook)
+    } for playbook in playbooks]
 
-    kctx.local(cmd)
+    with tempfile.NamedTemporaryFile('w',
+                                     prefix='kitipy-',
+                                     suffix='.yml',
+                                     delete=False) as f:
+        yaml.safe_dump(imports, f)
+        return f.name
@@ -1,11 +1,13 @@
 import click
 import contextlib
+import functools
 import subprocess
+import weakref
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 from .dispatcher import Dispatcher
 from .exceptions import TaskError
-from .executor import BaseExecutor, ProxyExecutor, _create_executor
+from .executor import BaseExecutor, Executor, ProxyExecutor, _create_executor
 
 
 class Context(ProxyExecutor):
@@ -34,6 +36,11 @@ class Context(ProxyExecutor):
     handled by RootCommand which can be created through the kitipy.root()
     decorator.
     """
+    # The Context is used by every single task to run commands, thus its
+    # attributes are stored in slots rather than in an instance __dict__.
+    __slots__ = ('config', 'stage', 'stack', 'dispatcher',
+                 '_stage_executors', '_stacks')
+
     def __init__(self,
                  config: Dict,
                  executor: BaseExecutor,
@@ -70,17 +77,16 @@ class Context(ProxyExecutor):
         """
         super().__init__(executor)
         self.config = config
-        self._stage = stage
-        self._stack = stack
+        self.stage = stage  # type: Any
+        self.stack = stack
         self.dispatcher = dispatcher
-
-    @property
-    def stack(self):
-        return self._stack
-
-    @property
-    def stage(self):
-        return self._stage
+        # Executors are created once per stage and reused whenever the same
+        # stage is used again, such that remote executors can keep their
+        # SSH/SFTP connections open.
+        self._stage_executors = {}  # type: Dict[str, BaseExecutor]
+        # Stacks are cached too, such that their lazily loaded config doesn't
+        # have to be parsed again whenever the same stack is used.
+        self._stacks = {}  # type: Dict[Tuple, Any]
 
     @property
     def executor(self):
@@ -95,18 +101,31 @@ class Context(ProxyExecutor):
         finally:
             self._executor = previous
 
+    def close(self):
+        """Close the SSH/SFTP connections opened by the executors of the
+        stages used so far. This is automatically called by the RootCommand
+        when the CLI exits.
+        """
+        for exec in self._stage_executors.values():
+            if isinstance(exec, Executor):
+                exec.close()
+
     @contextmanager
     def using_stage(self, stage_name: str):
-        exec = _create_executor(self.config, stage_name, self.dispatcher)
+        exec = self._stage_executors.get(stage_name)
+        if exec is None:
+            exec = _create_executor(self.config, stage_name, self.dispatcher)
+            self._stage_executors[stage_name] = exec
+
         stage = self.config['stages'][stage_name]
-        previous = self._stage
+        previous = self.stage
 
         with self.using_executor(exec):
             try:
-                self._stage = stage
+                self.stage = stage
                 yield None
             finally:
-                self._stage = previous
+                self.stage = previous
 
     @contextmanager
     def using_stack(self,
@@ -114,8 +133,17 @@ class Context(ProxyExecutor):
                     filename_params: Optional[Dict[str, str]] = None):
         from .docker.stack import load_stack
 
-        filename_params = filename_params if filename_params else {}
-        stack = load_stack(self, stack_name, filename_params)
+        filename_params = dict(filename_params) if filename_params else {}
+        stage_name = self.stage['name'] if self.stage is not None else ''
+        # The executor is part of the key as stacks are bound to the executor
+        # of the stage they've been loaded for.
+        key = (stack_name, stage_name, self._executor,
+               frozenset(filename_params.items()))
+        stack = self._stacks.get(key)
+        if stack is None:
+            stack = load_stack(self, stack_name, filename_params)
+            self._stacks[key] = stack
+
         stack_cfg = self.config['stacks'][stack_name]
         basedir = stack_cfg.get('basedir')
 
@@ -123,28 +151,91 @@ class Context(ProxyExecutor):
         if basedir:
             cm = self.cd(basedir)
 
-        previous = self._stack
+        previous = self.stack
         with cm:
             try:
-                self._stack = stack
+                self.stack = stack
                 yield None
             finally:
-                self._stack = previous
+                self.stack = previous
+
+    async def run_async(self, cmd: Union[str, List[str]],
+                        **kwargs) -> subprocess.CompletedProcess:
+        """Run a command through the current executor, like run() does, but
+        without blocking the event loop. The command is run in the default
+        executor of the running loop, such that several commands can be run
+        concurrently with asyncio.gather().
+
+        Args:
+            cmd (Union[str, List[str]]):
+                The command to run.
+            **kwargs:
+                Any other argument accepted by run().
+
+        Raises:
+            subprocess.CalledProcessError: When check is True and the command
+                fails.
+
+        Returns:
+            subprocess.CompletedProcess: The result of the command.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.run, cmd, **kwargs))
+
+    def gather(self, *cmds: Union[str, List[str]],
+               **kwargs) -> List[subprocess.CompletedProcess]:
+        """Run independent commands concurrently through the current executor
+        and wait for all of them to finish (e.g. to run tests and linters at
+        the same time).
+
+        Args:
+            *cmds (Union[str, List[str]]):
+                The commands to run.
+            **kwargs:
+                Any other argument accepted by run(). They're used for every
+                command.
+
+        Raises:
+            subprocess.CalledProcessError: When check is True and one of the
+                commands fails.
+
+        Returns:
+            List[subprocess.CompletedProcess]: The result of each command, in
+                the same order as cmds.
+        """
+        import asyncio
+
+        async def run_all():
+            return await asyncio.gather(
+                *[self.run_async(cmd, **kwargs) for cmd in cmds])
+
+        return asyncio.run(run_all())
 
     def invoke(self, cmd: click.Command, *args, **kwargs):
         """Call invoke() method on current click.Context"""
         parent = click.get_current_context()
         ctx = click.Context(cmd, info_name=cmd.name, parent=parent)
 
-        for param in cmd.params:
-            if not param.expose_value or param.name in kwargs:
-                continue
-
-            default = param.get_default(ctx)
-            if param.name in parent.params:
-                default = parent.params[param.name]
-
-            kwargs[param.name] = default
+        # Most tasks don't declare any param, there's nothing to resolve in
+        # such case.
+        if cmd.params:
+            parent_params = parent.params
+            static_defaults, dynamic_params = _get_param_defaults(cmd, ctx)
+            for name, default in static_defaults.items():
+                if name not in kwargs:
+                    kwargs[name] = parent_params.get(name, default)
+
+            for param in dynamic_params:
+                name = param.name
+                if name in kwargs:
+                    continue
+                if name in parent_params:
+                    kwargs[name] = parent_params[name]
+                else:
+                    kwargs[name] = param.get_default(ctx)
 
         callback = cmd.callback
         if callback is None:
@@ -161,28 +252,20 @@ class Context(ProxyExecutor):
         return click.echo(*args, **kwargs)
 
     def info(self, message: str):
-        """Output a colored info message (black on cyan) on stderr using :func:`click.secho`."""
-        return click.secho('INFO: ' + message,
-                           bg='cyan',
-                           fg='black',
-                           bold=True,
-                           err=True)
+        """Output a colored info message (black on cyan) on stderr using :func:`click.echo`."""
+        return click.echo(_INFO_STYLE + 'INFO: ' + message + _RESET_STYLE,
+                          err=True)
 
     def warning(self, message: str):
-        """Output a colored warning message (black on yellow) on stderr, using :func:`click.secho`."""
-        return click.secho('WARNING: ' + message,
-                           bg='yellow',
-                           fg='black',
-                           bold=True,
-                           err=True)
+        """Output a colored warning message (black on yellow) on stderr, using :func:`click.echo`."""
+        return click.echo(_WARNING_STYLE + 'WARNING: ' + message +
+                          _RESET_STYLE,
+                          err=True)
 
     def error(self, message: str):
-        """Output a colored error message (white on red) on stderr using :func:`click.secho`."""
-        return click.secho('ERROR: ' + message,
-                           bg='red',
-                           fg='bright_white',
-                           bold=True,
-                           err=True)
+        """Output a colored error message (white on red) on stderr using :func:`click.echo`."""
+        return click.echo(_ERROR_STYLE + 'ERROR: ' + message + _RESET_STYLE,
+                          err=True)
 
     def fail(self, message):
         """Call fail() method on current click.Context"""
@@ -191,6 +274,65 @@ class Context(ProxyExecutor):
 
 pass_context = click.make_pass_decorator(Context)
 
+# ANSI styles used by Context.info(), warning() and error() are computed once
+# rather than on every message. click.echo() still strips them when stderr
+# isn't a terminal.
+_INFO_STYLE = click.style('', bg='cyan', fg='black', bold=True, reset=False)
+_WARNING_STYLE = click.style('',
+                             bg='yellow',
+                             fg='black',
+                             bold=True,
+                             reset=False)
+_ERROR_STYLE = click.style('',
+                           bg='red',
+                           fg='bright_white',
+                           bold=True,
+                           reset=False)
+_RESET_STYLE = click.style('', reset=True)
+
+_param_defaults = weakref.WeakKeyDictionary(
+)  # type: weakref.WeakKeyDictionary[click.Command, Tuple[Dict[str, Any], List[click.Parameter]]]
+
+
+def _get_param_defaults(
+        cmd: click.Command, click_ctx: click.Context
+) -> Tuple[Dict[str, Any], List[click.Parameter]]:
+    """Split the params exposed by a command between those with a static
+    default value and those with a dynamic one, such that Context.invoke()
+    only has to resolve the dynamic ones on every call.
+
+    A default is dynamic when it's a callable or when the param has a file
+    type (which opens the file when the value is converted). Static defaults
+    are computed once and cached along with the list of dynamic params.
+
+    Args:
+        cmd (click.Command):
+            The command whose default param values should be retrieved.
+        click_ctx (click.Context):
+            The click Context used to convert default values.
+
+    Returns:
+        Tuple[Dict[str, Any], List[click.Parameter]]: The static default
+            values by param names and the list of params with a dynamic
+            default.
+    """
+    cached = _param_defaults.get(cmd)
+    if cached is not None:
+        return cached
+
+    static_defaults = {}  # type: Dict[str, Any]
+    dynamic_params = []  # type: List[click.Parameter]
+    for param in cmd.params:
+        if not param.expose_value:
+            continue
+        if callable(param.default) or isinstance(param.type, click.File):
+            dynamic_params.append(param)
+        else:
+            static_defaults[param.name] = param.get_default(click_ctx)
+
+    _param_defaults[cmd] = (static_defaults, dynamic_params)
+    return static_defaults, dynamic_params
+
 
 def get_current_context(click_ctx: Optional[click.Context] = None) -> Context:
     """
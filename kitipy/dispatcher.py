@@ -1,18 +1,28 @@
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 class Dispatcher(object):
     """This dispatcher is mostly used to decouple CLI concerns from SSH/SFTP
     handling.
     """
-    def __init__(self, listeners: Dict[str, List[Callable[..., bool]]] = {}):
+    __slots__ = ('__listeners', )
+
+    def __init__(self,
+                 listeners: Optional[Dict[str, List[Callable[...,
+                                                             bool]]]] = None):
         """
         Args:
-            listeners (Dict[str, Callable[..., bool]]):
+            listeners (Optional[Dict[str, Callable[..., bool]]]):
                 List of callables taking undefined arguments and returning a
                 bool associated to event names.
         """
-        self.__listeners = listeners
+        # Listeners are stored in tuples as they're iterated over much more
+        # often than they're registered, and this way emit() never sees the
+        # list of listeners change while it iterates over it.
+        self.__listeners = {
+            event_name: tuple(fns)
+            for event_name, fns in (listeners or {}).items()
+        }  # type: Dict[str, Tuple[Callable[..., bool], ...]]
 
     def on(self, event_name: str, fn: Callable[..., bool]):
         """Register a listener for a given event name.
@@ -25,10 +35,8 @@ class Dispatcher(object):
                 name.
         """
 
-        if event_name not in self.__listeners:
-            self.__listeners[event_name] = []
-
-        self.__listeners[event_name].append(fn)
+        listeners = self.__listeners.get(event_name, ())
+        self.__listeners[event_name] = listeners + (fn, )
 
     def emit(self, event_name: str, **kwargs: Any):
         """Trigger all the event listeners registered for a given event name.
@@ -44,9 +52,12 @@ class Dispatcher(object):
             **kwargs: Any arguments associated with the event
         """
 
-        if event_name not in self.__listeners:
+        # This is called for every chunk of data transferred by the executor,
+        # hence the single dict lookup.
+        listeners = self.__listeners.get(event_name)
+        if listeners is None:
             return
 
-        for fn in self.__listeners[event_name]:
+        for fn in listeners:
             if not fn(**kwargs):
                 return
@@ -1,8 +1,15 @@
 from . import actions as docker_actions
-from . import filters as docker_filters
-from . import tasks as docker_tasks
 from .stack import BaseStack, ComposeStack, SwarmStack, load_stack
 
+# Filters and tasks are imported on first access (see __getattr__ below), such
+# that loading a stack doesn't have to declare the whole docker task group.
+_lazy_submodules = {
+    'docker_filters': 'filters',
+    'docker_tasks': 'tasks',
+    'filters': 'filters',
+    'tasks': 'tasks',
+}
+
 __all__ = [
     #from stack module
     'BaseStack',
@@ -15,3 +22,13 @@ __all__ = [
     'docker_filters',
     'docker_tasks',
 ]
+
+
+def __getattr__(name: str):
+    if name not in _lazy_submodules:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    import importlib
+    module = importlib.import_module('.' + _lazy_submodules[name], __name__)
+    globals()[name] = module
+    return module
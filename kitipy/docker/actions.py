@@ -1,8 +1,52 @@
 import os
+import re
+import shlex
 import subprocess
+import weakref
 from ..context import Context, get_current_context, get_current_executor
-from ..utils import append_cmd_flags
-from typing import Any, Dict, List, Optional, Union
+from ..executor import BaseExecutor
+from ..utils import append_cmd_args
+from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Literal,
+                    Optional, Tuple, Union, overload)
+
+if TYPE_CHECKING:
+    import requests
+
+# Base args of the commands built with append_cmd_args().
+_NETWORK_LS_ARGS = ('docker', 'network', 'ls')
+_NETWORK_INSPECT_ARGS = ('docker', 'network', 'inspect')
+_NETWORK_CREATE_ARGS = ('docker', 'network', 'create')
+_SECRET_CREATE_ARGS = ('docker', 'secret', 'create')
+_CONTAINER_PS_ARGS = ('docker', 'container', 'ps')
+_IMAGETOOLS_INSPECT_ARGS = ('docker', 'buildx', 'imagetools', 'inspect')
+_BUILDX_BUILD_ARGS = ('docker', 'buildx', 'build')
+_CONTAINER_RUN_ARGS = ('docker', 'container', 'run')
+
+# Env vars always set when running `docker buildx build`.
+_BUILDKIT_ENV = {"DOCKER_BUILDKIT": "1", "DOCKER_CLI_EXPERIMENTAL": "enabled"}
+
+# Results of successful `docker buildx imagetools inspect`, per executor. Images
+# aren't expected to disappear from their registry during a single run, unlike
+# missing images which might get pushed in the meantime, so failed lookups are
+# never cached.
+_found_images = weakref.WeakKeyDictionary(
+)  # type: weakref.WeakKeyDictionary[BaseExecutor, Dict[Tuple[str, ...], subprocess.CompletedProcess]]
+
+# Manifest media types accepted by registry_manifest_exists(), such that both
+# single and multi-platform images are found.
+_MANIFEST_ACCEPT = ', '.join((
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+    'application/vnd.oci.image.manifest.v1+json',
+))
+_REGISTRY_TIMEOUT = 10
+_AUTH_PARAM_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# The HTTP session is shared by all registry lookups to reuse connections, and
+# the bearer tokens are kept per registry and repository.
+_registry_session = None  # type: Optional[requests.Session]
+_registry_tokens = {}  # type: Dict[Tuple[str, str], str]
 
 
 def network_ls(_pipe: bool = False,
@@ -27,8 +71,8 @@ def network_ls(_pipe: bool = False,
             mode is disabled.
     """
     exec = get_current_executor()
-    cmd = append_cmd_flags("docker network ls", **kwargs)
-    return exec.run(cmd, pipe=_pipe, check=_check)
+    args = append_cmd_args(_NETWORK_LS_ARGS, **kwargs)
+    return exec.run(args, shell=False, pipe=_pipe, check=_check)
 
 
 def network_inspect(networks: Union[str, List[str]],
@@ -36,11 +80,9 @@ def network_inspect(networks: Union[str, List[str]],
                     _check: bool = True,
                     **kwargs) -> subprocess.CompletedProcess:
     exec = get_current_executor()
-    cmd = append_cmd_flags("docker network inspect", **kwargs)
+    args = append_cmd_args(_NETWORK_INSPECT_ARGS, **kwargs)
     networks = [networks] if isinstance(networks, str) else networks
-    return exec.run('%s %s' % (cmd, ' '.join(networks)),
-                    pipe=_pipe,
-                    check=_check)
+    return exec.run(args + networks, shell=False, pipe=_pipe, check=_check)
 
 
 def network_exists(name: str) -> bool:
@@ -72,8 +114,8 @@ def network_create(name: str,
             mode is disabled.
     """
     exec = get_current_executor()
-    cmd = append_cmd_flags("docker network create", **kwargs)
-    return exec.run("%s %s" % (cmd, name), pipe=_pipe, check=_check)
+    args = append_cmd_args(_NETWORK_CREATE_ARGS, **kwargs)
+    return exec.run(args + [name], shell=False, pipe=_pipe, check=_check)
 
 
 def secret_create(name: str,
@@ -110,22 +152,31 @@ def secret_create(name: str,
             mode is disabled.
     """
     exec = get_current_executor()
-    cmd = append_cmd_flags('docker secret create', **kwargs)
+    args = append_cmd_args(_SECRET_CREATE_ARGS, **kwargs)
 
-    with open(file, 'r') as f:
-        secret = f.read().rstrip('\r\n')
-        return exec.run('%s %s -' % (cmd, name),
-                        input=secret,
-                        pipe=_pipe,
-                        check=_check)
+    # The secret is sent as is, in binary mode, to not decode and then encode
+    # it back to pass it to the subprocess.
+    with open(file, 'rb') as f:
+        secret = f.read().rstrip(b'\r\n')
+
+    res = exec.run(args + [name, '-'],
+                   shell=False,
+                   input=secret,
+                   text=False,
+                   pipe=_pipe,
+                   check=_check)
+    res.stdout = res.stdout.decode() if res.stdout else ''
+    res.stderr = res.stderr.decode() if res.stderr else ''
+    return res
 
 
 def buildx_imagetools_inspect(image: str,
-                              _pipe: bool = False,
+                              _pipe: bool = True,
                               _check: bool = True,
                               **kwargs) -> subprocess.CompletedProcess:
     """Run `docker buildx imagetools inspect` through kitipy executor. This is
-    useful to test if the given image exists on a remote repo.
+    useful to test if the given image exists on a remote repo. Once an image
+    has been found, it's not looked up again by the same executor.
     
     Note that you need docker v19.03+ or you need to install docker-buildx
     plugin manually. This function won't test if buildx is available first.
@@ -137,7 +188,9 @@ def buildx_imagetools_inspect(image: str,
         **kwargs:
             Takes any CLI flag accepted by `docker buildx imagetools inspect`.
         _pipe (bool):
-            Whether executor pipe mode should be enabled.
+            Whether executor pipe mode should be enabled. It's enabled by
+            default, such that the output of the command doesn't clutter the
+            CLI and is made available through the returned CompletedProcess.
         _check (bool):
             Whether the exit code of the subprocess should be checked.
     
@@ -150,9 +203,60 @@ def buildx_imagetools_inspect(image: str,
             mode is disabled.
     """
     exec = get_current_executor()
-    cmd = append_cmd_flags('docker buildx imagetools inspect %s' % (image),
-                           **kwargs)
-    return exec.run("%s >/dev/null 2>&1" % (cmd), pipe=_pipe, check=_check)
+    args = append_cmd_args(_IMAGETOOLS_INSPECT_ARGS, **kwargs) + [image]
+
+    found = _found_images.setdefault(exec, {})
+    key = tuple(args)
+    if key in found:
+        return found[key]
+
+    res = exec.run(args, shell=False, pipe=_pipe, check=_check)
+    # Only piped results are cached, as others have no output to return to
+    # callers asking for it.
+    if res.returncode == 0 and _pipe:
+        found[key] = res
+    return res
+
+
+def buildx_imagetools_inspect_many(images: List[str],
+                                   _check: bool = True,
+                                   **kwargs) -> List[subprocess.CompletedProcess]:
+    """Run `docker buildx imagetools inspect` for each of the given images
+    through kitipy executor. Unlike calling buildx_imagetools_inspect() in a
+    loop, the images that haven't been found yet are all looked up through a
+    single batch of commands (see Executor.run_batch()), thus remote
+    executors open a single SSH channel for all of them.
+
+    Args:
+        images (List[str]):
+            The images to check. See buildx_imagetools_inspect().
+        **kwargs:
+            Takes any CLI flag accepted by `docker buildx imagetools inspect`.
+        _check (bool):
+            Whether the exit code of the subprocesses should be checked.
+
+    Raises:
+        subprocess.SubprocessError: When check mode is enabled and one of the
+            subprocesses fails.
+
+    Returns:
+        List[subprocess.CompletedProcess]: The result of each lookup, in the
+            same order as images.
+    """
+    exec = get_current_executor()
+    base_args = append_cmd_args(_IMAGETOOLS_INSPECT_ARGS, **kwargs)
+    keys = [tuple(base_args + [image]) for image in images]
+
+    found = _found_images.setdefault(exec, {})
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    results = dict(
+        zip(missing, exec.run_batch([list(key) for key in missing],
+                                    check=_check)))
+    for key, res in results.items():
+        if res.returncode == 0:
+            found[key] = res
+
+    return [found.get(key) or results[key] for key in keys]
 
 
 def buildx_build(context: str,
@@ -167,6 +271,10 @@ def buildx_build(context: str,
     Args:
         context (str):
             Root dir of the build context.
+        _env (Optional[Dict[str, str]]):
+            Env vars used to run the build. This dict is left untouched:
+            DOCKER_BUILDKIT and DOCKER_CLI_EXPERIMENTAL are always enabled on
+            top of it.
         **kwargs:
             Takes any CLI Flag accepted by `docker buildx build`.
 
@@ -176,14 +284,13 @@ def buildx_build(context: str,
     Returns:
         :class:`subprocess.CompletedProcess`: When the process is successful.
     """
-
-    cmd = append_cmd_flags('docker buildx build', **kwargs)
-    env = _env if _env is not None else {}
-    env.update({"DOCKER_BUILDKIT": "1", "DOCKER_CLI_EXPERIMENTAL": "enabled"})
+    args = append_cmd_args(_BUILDX_BUILD_ARGS, **kwargs) + [context]
+    env = dict(_env or {}, **_BUILDKIT_ENV)
 
     exec = get_current_executor()
-    return exec.local(cmd + ' ' + context,
+    return exec.local(args,
                       cwd=_cwd,
+                      shell=False,
                       pipe=_pipe,
                       check=_check,
                       env=env)
@@ -212,8 +319,8 @@ def container_ps(_pipe: bool = False,
             mode is disabled.
     """
     exec = get_current_executor()
-    cmd = append_cmd_flags('docker container ps', **kwargs)
-    return exec.run(cmd, pipe=_pipe, check=_check)
+    args = append_cmd_args(_CONTAINER_PS_ARGS, **kwargs)
+    return exec.run(args, shell=False, pipe=_pipe, check=_check)
 
 
 def container_run(image: str,
@@ -247,11 +354,40 @@ def container_run(image: str,
         :class:`subprocess.CompletedProcess`: When the process is successful or check
             mode is disabled.
     """
-    exec = get_current_executor()
-    kwargs.setdefault('rm', True)
-    shcmd = append_cmd_flags('docker container run', **kwargs)
-    shcmd += ' %s %s' % (image, cmd)
-    return exec.run(shcmd, pipe=_pipe, check=_check)
+    run = container_run_factory(rm=rm, **kwargs)
+    return run(image, cmd, _pipe=_pipe, _check=_check)
+
+
+def container_run_factory(
+        rm: bool = True,
+        **kwargs) -> Callable[..., subprocess.CompletedProcess]:
+    """Prepare a `docker container run` command with the given flags, and
+    return a function running it through kitipy executor. This is useful to
+    run many containers with the same flags, as they're processed only once.
+
+    Args:
+        rm (bool):
+            Whether --rm flag should be used (True by default).
+        **kwargs:
+            Take any CLI flag accepted by `docker run`.
+
+    Returns:
+        Callable[..., subprocess.CompletedProcess]: A function with the same
+            signature as container_run(), except the docker flags.
+    """
+    # Boolean flags are appended whatever their value, thus rm is only set
+    # when it's enabled.
+    kwargs['rm'] = True if rm else None
+    base_cmd = shlex.join(append_cmd_args(_CONTAINER_RUN_ARGS, **kwargs))
+
+    def run(image: str,
+            cmd: str,
+            _pipe: bool = False,
+            _check: bool = True) -> subprocess.CompletedProcess:
+        shcmd = '%s %s %s' % (base_cmd, shlex.quote(image), cmd)
+        return get_current_executor().run(shcmd, pipe=_pipe, check=_check)
+
+    return run
 
 
 def get_service_labels(kctx: Context, service_name: str) -> List[str]:
@@ -270,7 +406,21 @@ def normalize_labels(labels: Union[Dict[str, str], List[str]]) -> List[str]:
     if not isinstance(labels, dict):
         return labels
 
-    return [k + "=" + v for k, v in labels.items()]
+    return ["%s=%s" % (k, v) for k, v in labels.items()]
+
+
+@overload
+def find_service_label(kctx: Context, service_name: str, label: str,
+                       one: Literal[True]) -> Optional[str]:
+    ...
+
+
+@overload
+def find_service_label(kctx: Context,
+                       service_name: str,
+                       label: str,
+                       one: Literal[False] = False) -> List[str]:
+    ...
 
 
 def find_service_label(kctx: Context,
@@ -281,7 +431,7 @@ def find_service_label(kctx: Context,
     plen = len(pattern)
 
     labels = get_service_labels(kctx, service_name)
-    found = [label[plen:] for v in labels if v.startswith(pattern)]
+    found = [v[plen:] for v in labels if v.startswith(pattern)]
 
     if one:
         return found[0] if len(found) > 0 else None
@@ -290,8 +440,12 @@ def find_service_label(kctx: Context,
 
 
 def find_default_shell(kctx: Context, service_name: str) -> Optional[str]:
+    """Find the shell to use for the given service, as declared through its
+    io.kitipy.docker.default_shell label. This only looks at the stack config,
+    the service containers are never probed.
+    """
     label = "io.kitipy.docker.default_shell"
-    return kctx.stack.find_service_label(service_name, label, one=True)
+    return find_service_label(kctx, service_name, label, one=True)
 
 
 def registry_authenticate(server: str, username: str, password: str):
@@ -299,3 +453,101 @@ def registry_authenticate(server: str, username: str, password: str):
     cmd = "docker login --username={username} --password-stdin {server}".format(
         username=username, server=server)
     kctx.local(cmd, input=password)
+
+
+def registry_manifest_exists(image_ref: str) -> Optional[bool]:
+    """Check if the given image exists on its registry, by directly querying
+    the Registry HTTP API for its manifest. This is much faster than
+    buildx_imagetools_inspect() as it doesn't start the docker CLI, but it's
+    always run from the local host and it only supports anonymous access.
+
+    Args:
+        image_ref (str):
+            The image to check. It follows the same format as docker CLI:
+            when the image name has no registry part, it's looked up on
+            Docker Hub.
+
+    Returns:
+        Optional[bool]: Whether the image exists, or None when the registry
+            couldn't tell (e.g. it requires credentials or it can't be
+            reached). Use buildx_imagetools_inspect() in such case.
+    """
+    import requests
+
+    global _registry_session
+    if _registry_session is None:
+        _registry_session = requests.Session()
+
+    registry, repo, reference = _parse_image_ref(image_ref)
+    url = 'https://%s/v2/%s/manifests/%s' % (registry, repo, reference)
+    headers = {'Accept': _MANIFEST_ACCEPT}
+
+    try:
+        token = _registry_tokens.get((registry, repo))
+        if token is not None:
+            headers['Authorization'] = 'Bearer ' + token
+
+        res = _registry_session.head(url,
+                                     headers=headers,
+                                     timeout=_REGISTRY_TIMEOUT)
+        if res.status_code == 401:
+            token = _fetch_registry_token(
+                _registry_session, res.headers.get('WWW-Authenticate', ''))
+            if token is None:
+                return None
+
+            _registry_tokens[(registry, repo)] = token
+            headers['Authorization'] = 'Bearer ' + token
+            res = _registry_session.head(url,
+                                         headers=headers,
+                                         timeout=_REGISTRY_TIMEOUT)
+    except requests.RequestException:
+        return None
+
+    if res.status_code == 200:
+        return True
+    if res.status_code == 404:
+        return False
+    return None
+
+
+def _parse_image_ref(image_ref: str) -> Tuple[str, str, str]:
+    name, at, digest = image_ref.partition('@')
+    base, colon, tag = name.rpartition(':')
+    # Colons might also be found in the registry part of the image name,
+    # when it has a port number (e.g. localhost:5000/foo).
+    if colon and '/' not in tag:
+        name = base
+    else:
+        tag = 'latest'
+    # When both are given, the digest takes precedence over the tag.
+    reference = digest if at else tag
+
+    registry, sep, repo = name.partition('/')
+    if not sep or ('.' not in registry and ':' not in registry
+                   and registry != 'localhost'):
+        registry, repo = 'docker.io', name
+    if registry == 'docker.io':
+        registry = 'registry-1.docker.io'
+        repo = repo if '/' in repo else 'library/' + repo
+
+    return registry, repo, reference
+
+
+def _fetch_registry_token(session: 'requests.Session',
+                          challenge: str) -> Optional[str]:
+    scheme, _, params = challenge.partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+
+    params_dict = dict(_AUTH_PARAM_RE.findall(params))
+    realm = params_dict.pop('realm', None)
+    if realm is None:
+        return None
+
+    res = session.get(realm, params=params_dict, timeout=_REGISTRY_TIMEOUT)
+    if res.status_code != 200:
+        return None
+
+    body = res.json()
+    return body.get('token') or body.get('access_token')
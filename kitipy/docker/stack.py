@@ -1,15 +1,20 @@
 import click
 import json
 import os
+import shlex
 import subprocess
 import yaml
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 from .actions import buildx_build, normalize_labels
 from ..context import Context
 from ..executor import BaseExecutor
-from ..utils import append_cmd_flags
+from ..utils import append_cmd_args, append_cmd_flags
+
+# Base args of the commands built with append_cmd_args().
+_COMPOSE_EXEC_ARGS = ('docker-compose', 'exec')
+_COMPOSE_RUN_ARGS = ('docker-compose', 'run')
 
 
 class BaseStack(ABC):
@@ -89,12 +94,12 @@ class BaseStack(ABC):
         pass
 
     @abstractmethod
-    def exec(self, service: str, cmd: str,
+    def exec(self, service: str, cmd: Union[str, Sequence[str]],
              **kwargs) -> subprocess.CompletedProcess:
         pass
 
     @abstractmethod
-    def run(self, service: str, cmd: str,
+    def run(self, service: str, cmd: Union[str, Sequence[str]],
             **kwargs) -> subprocess.CompletedProcess:
         pass
 
@@ -262,24 +267,41 @@ class ComposeStack(BaseStack):
 
     def exec(self,
              service: str,
-             cmd: str,
+             cmd: Union[str, Sequence[str]],
              _pipe: bool = False,
              _check: bool = True,
              **kwargs) -> subprocess.CompletedProcess:
-        exec = append_cmd_flags('docker-compose exec', **kwargs)
-        return self._run('%s %s %s' % (exec, service, cmd),
+        """Run `docker-compose exec`. When cmd is a string, it's parsed by a
+        shell. Otherwise, it's a list of args that are quoted, such that
+        they're passed as is to the container.
+        """
+        if isinstance(cmd, str):
+            exec = append_cmd_flags('docker-compose exec', **kwargs)
+            return self._run('%s %s %s' % (exec, service, cmd),
+                             pipe=_pipe,
+                             check=_check)
+
+        args = append_cmd_args(_COMPOSE_EXEC_ARGS, **kwargs)
+        return self._run(shlex.join(args + [service, *cmd]),
                          pipe=_pipe,
                          check=_check)
 
     def run(self,
             service: str,
-            cmd: str,
+            cmd: Union[str, Sequence[str]],
             _pipe: bool = False,
             _check: bool = True,
             **kwargs) -> subprocess.CompletedProcess:
+        """Run `docker-compose run`. See exec() about the cmd format."""
         kwargs.setdefault('rm', True)
-        run = append_cmd_flags('docker-compose run', **kwargs)
-        return self._run('%s %s %s' % (run, service, cmd),
+        if isinstance(cmd, str):
+            run = append_cmd_flags('docker-compose run', **kwargs)
+            return self._run('%s %s %s' % (run, service, cmd),
+                             pipe=_pipe,
+                             check=_check)
+
+        args = append_cmd_args(_COMPOSE_RUN_ARGS, **kwargs)
+        return self._run(shlex.join(args + [service, *cmd]),
                          pipe=_pipe,
                          check=_check)
 
@@ -500,25 +522,43 @@ class SwarmStack(BaseStack):
 
     def exec(self,
              service: str,
-             cmd: str,
+             cmd: Union[str, Sequence[str]],
              _pipe: bool = False,
              _check: bool = True,
              **kwargs) -> subprocess.CompletedProcess:
+        """Run `docker-compose exec`. See ComposeStack.exec() about the cmd
+        format.
+        """
         # @TODO: this is not going to work (docker-compose in SwarmStack)
-        basecmd = append_cmd_flags('docker-compose exec', **kwargs)
-        return self._run('%s %s %s' % (basecmd, service, cmd),
+        if isinstance(cmd, str):
+            basecmd = append_cmd_flags('docker-compose exec', **kwargs)
+            return self._run('%s %s %s' % (basecmd, service, cmd),
+                             pipe=_pipe,
+                             check=_check)
+
+        args = append_cmd_args(_COMPOSE_EXEC_ARGS, **kwargs)
+        return self._run(shlex.join(args + [service, *cmd]),
                          pipe=_pipe,
                          check=_check)
 
     def run(self,
             service: str,
-            cmd: str,
+            cmd: Union[str, Sequence[str]],
             _pipe: bool = False,
             _check: bool = True,
             **kwargs) -> subprocess.CompletedProcess:
+        """Run `docker-compose run`. See ComposeStack.exec() about the cmd
+        format.
+        """
         kwargs.setdefault('rm', True)
-        run = append_cmd_flags('docker-compose run', **kwargs)
-        return self._run('%s %s %s' % (run, service, cmd),
+        if isinstance(cmd, str):
+            run = append_cmd_flags('docker-compose run', **kwargs)
+            return self._run('%s %s %s' % (run, service, cmd),
+                             pipe=_pipe,
+                             check=_check)
+
+        args = append_cmd_args(_COMPOSE_RUN_ARGS, **kwargs)
+        return self._run(shlex.join(args + [service, *cmd]),
                          pipe=_pipe,
                          check=_check)
 
@@ -579,8 +619,7 @@ def load_stack(kctx: Context,
     if 'stacks' not in config:
         raise click.BadParameter('No top key "stacks" found in the config.')
 
-    stack_config = next(
-        (v for k, v in config['stacks'].items() if k == stack_name), None)
+    stack_config = config['stacks'].get(stack_name)
     if stack_config is None:
         raise click.BadParameter('Stack %s not defined in the config.' %
                                  (stack_name))
@@ -20,9 +20,17 @@ def docker_tasks(kctx: kitipy.Context):
 @docker_tasks.task()
 @click.argument('services', nargs=-1, type=str)
 @click.option('--tag', type=str, default='dev')
-def build(kctx: kitipy.Context, tag: str = 'dev', services: List[str] = []):
+@click.option('--parallel/--no-parallel',
+              default=True,
+              help='Build the images of the services in parallel.')
+def build(kctx: kitipy.Context,
+          tag: str = 'dev',
+          services: List[str] = [],
+          parallel: bool = True):
     validate_tag(kctx, tag)
-    kctx.stack.build(services)
+    # Boolean flags are always appended by append_cmd_flags(), whatever their
+    # value, hence None when the flag shouldn't be used.
+    kctx.stack.build(services, parallel=True if parallel else None)
 
 
 @docker_tasks.task()
@@ -74,7 +82,7 @@ def restart(kctx: kitipy.Context, services: List[str]):
 @click.argument('service', nargs=1, type=str)
 @click.argument('cmd', nargs=-1, type=str)
 def exec(kctx: kitipy.Context, service: str, cmd: List[str]):
-    kctx.stack.exec(service, cmd)
+    kctx.stack.exec(service, list(cmd))
 
 
 @docker_tasks.task()
@@ -92,7 +100,7 @@ def shell(kctx: kitipy.Context, service: str):
 def run(kctx: kitipy.Context, service: str, user, cmd: List[str]):
     if len(cmd) == 0:
         cmd = ["/bin/sh"]
-    kctx.stack.run(service, ' '.join(cmd), user=user)
+    kctx.stack.run(service, list(cmd), user=user)
 
 
 @docker_tasks.task()
@@ -109,25 +117,52 @@ def compose(kctx: kitipy.Context, args: List[str] = []):
     kctx.stack.raw(args)
 
 
-def validate_tag(kctx: kitipy.Context, image_ref: str):
-    """Check if the given image reference exists on a remote Docker registry.
-    
+def validate_tag(kctx: kitipy.Context, tag: str):
+    """Check if the images of the current stack exist with the given tag on
+    their remote Docker registry.
+
     Args:
         kctx (kitipy.Context): The current kitipy Context.
-        image_ref (str):
-            A full image reference composed of: the repository to check, the
-            base image name and the image tag.
+        tag (str):
+            The image tag to check. It replaces the tag of every service
+            image declared by the stack.
 
     Raises:
-        click.Exception: When the given image tag doesn't exist.
+        click.Exception: When one of the images doesn't exist with the given
+            tag.
     """
-    if len(image_ref) == 0:
+    if len(tag) == 0:
         kctx.fail(
             "No image tag provided. You can provide it through --tag flag or IMAGE_TAG env var."
         )
 
-    images = (service['image'] for service in kctx.stack.config['services'])
+    images = [
+        _tag_image(service['image'], tag)
+        for service in kctx.stack.config['services'].values()
+        if 'image' in service
+    ]
+    # Images are first looked up through the Registry HTTP API, and only
+    # those it couldn't tell about (e.g. on private registries) are inspected
+    # through docker CLI.
+    found = {
+        image: actions.registry_manifest_exists(image)
+        for image in dict.fromkeys(images)
+    }
+    unknown = [image for image, exists in found.items() if exists is None]
+    if len(unknown) > 0:
+        results = actions.buildx_imagetools_inspect_many(unknown, _check=False)
+        for image, result in zip(unknown, results):
+            found[image] = result.returncode == 0
+
     for image in images:
-        result = actions.buildx_imagetools_inspect(image_ref, _check=False)
-        if result.returncode != 0:
-            kctx.fail('Image %s not found on remote registry.' % (image_ref))
+        if not found[image]:
+            kctx.fail('Image %s not found on remote registry.' % (image))
+
+
+def _tag_image(image: str, tag: str) -> str:
+    name, sep, current_tag = image.rpartition(':')
+    # Colons might also be found in the registry part of the image name, when
+    # it has a port number (e.g. localhost:5000/foo).
+    if not sep or '/' in current_tag:
+        name = image
+    return '%s:%s' % (name, tag)
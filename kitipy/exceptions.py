@@ -1,6 +1,11 @@
 import click
 from typing import Optional
 
+# Like Context.error(), the ANSI style is computed once. click.echo() still
+# strips it when the output isn't a terminal.
+_ERROR_PREFIX = click.style('Error: ', fg='bright_white', bg='red', reset=False)
+_RESET_STYLE = click.style('', reset=True)
+
 
 class TaskError(click.ClickException):
     def __init__(self,
@@ -13,7 +18,6 @@ class TaskError(click.ClickException):
 
     def show(self, file=None):
         color = self.click_ctx.color if self.click_ctx else None
-        msg = click.style('Error: %s' % self.format_message(),
-                          fg='bright_white',
-                          bg='red')
-        click.echo(msg, file=file, color=color)
+        click.echo(_ERROR_PREFIX + self.format_message() + _RESET_STYLE,
+                   file=file,
+                   color=color)
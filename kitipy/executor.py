@@ -1,29 +1,63 @@
 import click
+import concurrent.futures
+import functools
 import os.path
-import paramiko
+import queue
 import random
 import select
+import shlex
 import shutil
 import string
 import subprocess
 import sys
 import tempfile
+import threading
+import weakref
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from typing import Any, Callable, Dict, Optional, Tuple, Union
+from typing import (IO, TYPE_CHECKING, Any, Callable, Dict, List, Optional,
+                    Tuple, Union)
 from .dispatcher import Dispatcher
 
+# paramiko takes a significant part of kitipy import time, thus it's only
+# imported when a remote executor actually opens a connection.
+if TYPE_CHECKING:
+    import paramiko
+
+# Interval (in seconds) between two keepalive packets sent on idle SSH
+# connections, such that they aren't closed by the server or a NAT between two
+# commands.
+_SSH_KEEPALIVE_INTERVAL = 30
+
+# File transfers emit at most ~100 progress updates, and no more than one per
+# MB sent: paramiko calls its progress callback for each 32KB chunk.
+_TRANSFER_UPDATES = 100
+_MIN_TRANSFER_UPDATE_STEP = 1024 * 1024
+
+# Shell snippets used by Executor.run_batch() to run each command and print
+# its exit code, followed by a delimiter on both stdout and stderr.
+_BATCH_CMD_TEMPLATE = """(
+{cmd}
+)
+rc=$?
+printf '\\n{token} %d\\n' "$rc"
+printf '\\n{token}\\n' >&2
+"""
+_BATCH_STOP_ON_ERROR = """[ "$rc" -eq 0 ] || exit "$rc"
+"""
+
 
 class BaseExecutor(ABC):
+    __slots__ = ()
 
     @abstractmethod
     def local(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -34,11 +68,11 @@ class BaseExecutor(ABC):
     @abstractmethod
     def run(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -46,10 +80,38 @@ class BaseExecutor(ABC):
     ) -> subprocess.CompletedProcess:
         pass
 
+    def run_batch(self,
+                  cmds: List[Union[str, List[str]]],
+                  env: Optional[Dict[str, str]] = None,
+                  check: bool = True) -> List[subprocess.CompletedProcess]:
+        """Run a list of commands one after the other, with pipe mode enabled,
+        and return their results. See Executor.run_batch() for more details.
+        """
+        # Lists of args are run without shell, as run() expects.
+        return [
+            self.run(cmd,
+                     env=env,
+                     shell=isinstance(cmd, str),
+                     pipe=True,
+                     check=check) for cmd in cmds
+        ]
+
     @abstractmethod
     def copy(self, local_path: str, remote_path: str):
         pass
 
+    def copy_many(self, paths: List[Tuple[str, str]], parallelism: int = 4):
+        """Copy a list of (local_path, remote_path) files, one after the
+        other. See Executor.copy_many() for more details.
+        """
+        for local_path, remote_path in paths:
+            self.copy(local_path, remote_path)
+
+    def close(self):
+        """Release the resources held by the executor, if any. This does
+        nothing by default. See Executor.close() for more details.
+        """
+
     @abstractmethod
     def mkdtemp(self,
                 suffix: Optional[str] = None,
@@ -108,8 +170,10 @@ class Executor(BaseExecutor):
     SSH/SFTP client to do its job. Remote connections are lazily opened when
     the first command is run or when the first file is copied.
 
-    The SSH/SFTP connections are automatically closed when the executor got
-    destroyed.
+    The SSH/SFTP connections are kept open and reused by subsequent commands
+    and file transfers. They're reopened if the server closed them in the
+    meantime and they're automatically closed when the executor got destroyed
+    or when close() is called.
     """
 
     def __init__(self,
@@ -144,22 +208,36 @@ class Executor(BaseExecutor):
         """
         self._ssh = None
         self._sftp = None
+        self._ssh_finalizer = None  # type: Optional[weakref.finalize]
         self._local_basedir = local_basedir
         self._remote_basedir = remote_basedir
         self._dispatcher = dispatcher
         self._ssh_config = None  # type: Optional[Dict[str, str]]
-        self._missing_host_key_policy = InteractiveWarningPolicy()
+        # Defaults to InteractiveWarningPolicy when the connection is opened.
+        self._missing_host_key_policy = None  # type: Optional[paramiko.MissingHostKeyPolicy]
 
         if hostname is not None:
             self._load_ssh_config(hostname, ssh_config_file, paramiko_config)
 
-    def __del__(self):
-        """Close SSH/SFTP connections when the Executor is destroyed."""
+    def __enter__(self) -> 'Executor':
+        return self
 
-        if self._ssh is not None:
-            self._ssh.close()
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close SSH/SFTP connections, if any. They'll be reopened if another
+        command is run or another file is copied afterwards.
+        """
         if self._sftp is not None:
             self._sftp.close()
+            self._sftp = None
+        if self._ssh is not None:
+            self._ssh.close()
+            self._ssh = None
+        if self._ssh_finalizer is not None:
+            self._ssh_finalizer.detach()
+            self._ssh_finalizer = None
 
     def _load_ssh_config(self, hostname: str, ssh_config_file: str,
                          paramiko_config: Dict[str, Any]):
@@ -179,11 +257,14 @@ class Executor(BaseExecutor):
                 like disabling look_for_keys to not try ~/.ssh/id_rsa key by
                 default.
         """
-        ssh_config_path = os.path.expanduser(ssh_config_file)
-        ssh_config = paramiko.SSHConfig()
+        import paramiko
 
-        with open(ssh_config_path) as f:
-            ssh_config.parse(f)
+        ssh_config_path = os.path.expanduser(ssh_config_file)
+        # The parsed file is shared by all the executors as long as it isn't
+        # modified. Lookups return new dicts, so it's never mutated.
+        stat = os.stat(ssh_config_path)
+        ssh_config = _parse_ssh_config_file(ssh_config_path, stat.st_mtime_ns,
+                                            stat.st_size)
 
         host_config = ssh_config.lookup(hostname)
         # @TODO: accept only a subset of all paramiko args (or it might be used to overwrite stage-specific parameters).
@@ -225,7 +306,7 @@ class Executor(BaseExecutor):
         self._ssh_config = cfg
 
     def set_missing_host_key_policy(self,
-                                    policy: paramiko.MissingHostKeyPolicy):
+                                    policy: 'paramiko.MissingHostKeyPolicy'):
         """Set the missing_host_key_policy used by paramiko when it stumbles
         upon a server with an unknown signature.
 
@@ -249,7 +330,7 @@ class Executor(BaseExecutor):
 
     # @TODO: manage private keys with passphrase
     @property
-    def ssh(self) -> paramiko.SSHClient:
+    def ssh(self) -> 'paramiko.SSHClient':
         """Get previously opened SSH connection or open it.
 
         Raises:
@@ -264,17 +345,43 @@ class Executor(BaseExecutor):
             raise RuntimeError(
                 "No SSH connection available: this is a local executor.")
 
-        if self._ssh == None:
+        # The connection might have been closed by the server (e.g. due to
+        # an idle timeout) since the last command.
+        if self._ssh is not None and not self._is_transport_active():
+            self.close()
+
+        if self._ssh is None:
+            import paramiko
+            from .ssh import InteractiveWarningPolicy
+
+            policy = self._missing_host_key_policy
+            if policy is None:
+                policy = InteractiveWarningPolicy()
+
             client = paramiko.SSHClient()
-            client.load_system_host_keys()
-            client.set_missing_host_key_policy(self._missing_host_key_policy)
+            # Like load_system_host_keys() but the parsed known_hosts file is
+            # shared by all the executors. Paramiko only reads system host
+            # keys, new keys are added to the client's own host keys.
+            client._system_host_keys = _load_system_host_keys()  # type: ignore
+            client.set_missing_host_key_policy(policy)
             client.connect(**self._ssh_config)
+            transport = client.get_transport()
+            if transport is not None:
+                transport.set_keepalive(_SSH_KEEPALIVE_INTERVAL)
             self._ssh = client
+            # Unclosed connections are closed when the Executor is garbage
+            # collected or at exit. Closing the SSH client also closes the
+            # SFTP channel opened through its transport.
+            self._ssh_finalizer = weakref.finalize(self, client.close)
 
         return self._ssh
 
+    def _is_transport_active(self) -> bool:
+        transport = self._ssh.get_transport() if self._ssh else None
+        return transport is not None and transport.is_active()
+
     @property
-    def sftp(self) -> paramiko.SFTPClient:
+    def sftp(self) -> 'paramiko.SFTPClient':
         """Get previously opened SFTP connection or open it.
 
         Raises:
@@ -289,7 +396,10 @@ class Executor(BaseExecutor):
             raise RuntimeError(
                 "No SFTP connection available: this is a local executor.")
 
-        if self._sftp == None:
+        if self._ssh is not None and not self._is_transport_active():
+            self.close()
+
+        if self._sftp is None:
             # @TODO: test what happens when both ssh/sftp connections are open and executor got destroyed (does it fail to close both?)
             self._sftp = self.ssh.open_sftp()
 
@@ -297,11 +407,11 @@ class Executor(BaseExecutor):
 
     def local(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -317,8 +427,9 @@ class Executor(BaseExecutor):
         events somewhere. Such checks are generally better run locally.
 
         Args:
-            cmd (str):
-                Command and args to run.
+            cmd (Union[str, List[str]]):
+                Command and args to run. It could either be a string or a list
+                of args, in which case shell should be set to False.
             env (Optional[Dict[str, str]]):
                 Env vars used to run the given cmd. When this is None (the
                 default value) the subprocess will inherit its env vars from
@@ -329,8 +440,9 @@ class Executor(BaseExecutor):
                 None (the default value), the current working directory is used.
             shell (bool):
                 Whether the command should be run in a shell (True by default).
-            input (Optional[str]):
-                Standard input of the subprocess.
+            input (Optional[Union[str, bytes]]):
+                Standard input of the subprocess. It should be bytes when text
+                is False.
             text (bool):
                 Whether stdin/stdout/stderr streams should be converted from/into
                 strings using encoding parameter or kept in binary format.
@@ -374,10 +486,10 @@ class Executor(BaseExecutor):
 
     def _remote(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -386,15 +498,19 @@ class Executor(BaseExecutor):
         """Run a command on remote host.
 
         Args:
-            cmd (str):
-                Command and args to run
+            cmd (Union[str, List[str]]):
+                Command and args to run. When a list of args is given, they're
+                quoted and joined as the remote command is always run through
+                a shell.
             env (Dict[str, str]):
                 Env vars used to run the given cmd.
             cwd (Optional[str]):
                 Working directory where the command should be run. When this is
                 None (the default value), the current working directory is used.
-            input (Optional[str]):
-                If passed, it's written to command stdin.
+                An empty string runs the command from the SSH login directory.
+            input (Optional[Union[str, bytes]]):
+                If passed, it's written to command stdin. It should be bytes
+                when text is False.
             text (bool):
                 Whether stdin/stdout/stderr streams should be converted from/into
                 strings using encoding parameter or kept in binary format.
@@ -421,16 +537,21 @@ class Executor(BaseExecutor):
         Returns:
             subprocess.CompletedProcess
         """
+        if not isinstance(cmd, str):
+            cmd = shlex.join(cmd)
+
         if not self.is_remote:
             raise RuntimeError(
                 'This Executor is running in local mode, could not run following command: %s'
                 % (cmd))
 
-        cwd = cwd or self._remote_basedir
-        if cwd:
-            self.ssh.exec_command('cd ' + cwd)
+        # Each command is run through its own SSH channel, with a new shell,
+        # thus the working directory has to be changed by the command itself.
+        if cwd is None:
+            cwd = self._remote_basedir
+        shcmd = 'cd %s && %s' % (shlex.quote(cwd), cmd) if cwd else cmd
 
-        sin, sout, serr = self.ssh.exec_command(cmd, environment=env)
+        sin, sout, serr = self.ssh.exec_command(shcmd, environment=env)
         channel = sin.channel
 
         if input is not None:
@@ -440,16 +561,18 @@ class Executor(BaseExecutor):
         sin.close()
         channel.shutdown_write()
 
-        encoding = encoding if encoding else sys.getdefaultencoding()
-        stdout, stderr = self._read_ssh_chunks(channel, text, encoding, pipe)
+        # Output chunks are accumulated in bytearrays, which grow in place,
+        # and are decoded once the command is over, such that multi-byte
+        # characters split over several chunks are properly decoded.
+        stdout = bytearray()
+        stderr = bytearray()
+        handle_out, handle_err = _output_handlers(pipe, stdout, stderr)
         while not channel.closed or channel.recv_ready(
         ) or channel.recv_stderr_ready():
             rlist, _, _ = select.select([channel], [], [])
 
             if len(rlist) > 0:
-                chunks = self._read_ssh_chunks(channel, text, encoding, pipe)
-                stdout += chunks[0]  # type: ignore
-                stderr += chunks[1]  # type: ignore
+                self._read_ssh_chunks(channel, handle_out, handle_err)
 
             if channel.exit_status_ready(
             ) and not channel.recv_ready() and not channel.recv_stderr_ready():
@@ -461,43 +584,39 @@ class Executor(BaseExecutor):
         serr.close()
 
         returncode = sin.channel.recv_exit_status()
-        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+        if not pipe:
+            return subprocess.CompletedProcess(cmd, returncode, '', '')
+
+        if not text:
+            return subprocess.CompletedProcess(cmd, returncode, bytes(stdout),
+                                               bytes(stderr))
+
+        encoding = encoding if encoding else sys.getdefaultencoding()
+        return subprocess.CompletedProcess(cmd, returncode,
+                                           stdout.decode(encoding),
+                                           stderr.decode(encoding))
 
     def _read_ssh_chunks(
             self,
-            channel: paramiko.channel.Channel,
-            text: bool,
-            encoding: str,
-            pipe: bool,
-    ) -> Tuple[Union[bytes, str], Union[bytes, str]]:
-        stdout_chunk = b''  # type: Union[bytes, str]
-        stderr_chunk = b''  # type: Union[bytes, str]
-
+            channel: 'paramiko.channel.Channel',
+            handle_out: Callable[[bytes], Any],
+            handle_err: Callable[[bytes], Any],
+    ):
+        """Read the output available on the given channel and pass it to the
+        stdout/stderr handlers returned by _output_handlers().
+        """
         if channel.recv_ready():
-            stdout_chunk = channel.recv(len(channel.in_buffer))
+            handle_out(channel.recv(len(channel.in_buffer)))
         if channel.recv_stderr_ready():
-            stderr_chunk = channel.recv_stderr(len(channel.in_stderr_buffer))
-
-        if text:
-            stdout_chunk = stdout_chunk.decode(encoding)  # type: ignore
-            stderr_chunk = stderr_chunk.decode(encoding)  # type: ignore
+            handle_err(channel.recv_stderr(len(channel.in_stderr_buffer)))
 
-        if not pipe:
-            print(stdout_chunk, file=sys.stdout, end='')
-            print(stderr_chunk, file=sys.stderr, end='')
-            stdout_chunk = ''
-            stderr_chunk = ''
-
-        return (stdout_chunk, stderr_chunk)
-
-    # @TODO: cmd signature have to be changed to accept list too (due to shell opts)
     def run(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -509,8 +628,11 @@ class Executor(BaseExecutor):
         whether the command should be locally or remotely.
 
         Args:
-            cmd (str):
-                Command and args to run
+            cmd (Union[str, List[str]]):
+                Command and args to run. It could either be a string or a list
+                of args. In local mode, shell should be set to False when a
+                list is given. In remote mode, the args are quoted and joined
+                as the remote command is always run through a shell.
             env (Optional[Dict[str, str]]):
                 Env vars used to run the given cmd. When this is None (the
                 default value) and the Executor is running in local mode, the
@@ -524,8 +646,9 @@ class Executor(BaseExecutor):
                 is used.
             shell (bool):
                 Whether the command should be run in a shell (True by default).
-            input (Optional[str]):
-                Standard input of the subprocess.
+            input (Optional[Union[str, bytes]]):
+                Standard input of the subprocess. It should be bytes when text
+                is False.
             text (bool):
                 Whether stdin/stdout/stderr streams should be converted from/into
                 strings using encoding parameter or kept in binary format.
@@ -570,6 +693,88 @@ class Executor(BaseExecutor):
                           pipe=pipe,
                           check=check)
 
+    def run_batch(self,
+                  cmds: List[Union[str, List[str]]],
+                  env: Optional[Dict[str, str]] = None,
+                  check: bool = True) -> List[subprocess.CompletedProcess]:
+        """Run a list of commands one after the other, with pipe mode enabled,
+        and return their results.
+
+        In remote mode, all the commands are sent through a single SSH
+        channel, as a single shell script, rather than opening a new channel
+        per command. This is useful to run a bunch of small commands (e.g.
+        to probe the state of a remote host), for which opening the channel
+        takes more time than running the command itself. Each command is run
+        in its own subshell, such that they can't change the working directory
+        or the env vars of the following ones.
+
+        Args:
+            cmds (List[Union[str, List[str]]]):
+                Commands to run. See run() for details about the accepted
+                format.
+            env (Optional[Dict[str, str]]):
+                Env vars used to run the given commands.
+            check (bool):
+                Whether the commands should stop at the first one returning an
+                exit code > 0, in which case an error is raised.
+
+        Raises:
+            subprocess.CalledProcessError: When check mode is enabled and one
+                of the commands fails, or when the remote script stops before
+                running all of them (e.g. the basedir doesn't exist), whatever
+                the check mode.
+            paramiko.SSHException:
+                When the SSH client fail to run the commands.
+
+        Returns:
+            List[subprocess.CompletedProcess]: The result of each command, in
+                the same order as cmds.
+        """
+        if self.is_local or len(cmds) <= 1:
+            return super().run_batch(cmds, env=env, check=check)
+
+        cmds = [cmd if isinstance(cmd, str) else shlex.join(cmd) for cmd in cmds]
+        # The random token is used to delimit the output of each command in
+        # both the stdout and stderr streams of the whole script.
+        token = '__kitipy_batch_%s__' % ''.join(
+            random.choices(string.ascii_letters + string.digits, k=16))
+        template = _BATCH_CMD_TEMPLATE
+        if check:
+            template += _BATCH_STOP_ON_ERROR
+        script = ''.join(template.format(cmd=cmd, token=token) for cmd in cmds)
+        # _remote() would only chain the cd to the first command with &&, thus
+        # the script changes the working directory by itself and stops when
+        # it can't.
+        if self._remote_basedir:
+            script = 'cd %s || exit\n%s' % (shlex.quote(
+                self._remote_basedir), script)
+
+        res = self._remote(script, env=env, cwd='', pipe=True, check=False)
+
+        chunks = res.stdout.split('\n%s ' % (token))
+        stderrs = res.stderr.split('\n%s\n' % (token))
+        stdout = chunks[0]
+        results = []
+        for cmd, chunk, stderr in zip(cmds, chunks[1:], stderrs):
+            returncode, _, next_stdout = chunk.partition('\n')
+            results.append(
+                subprocess.CompletedProcess(cmd, int(returncode), stdout,
+                                            stderr))
+            stdout = next_stdout
+
+        if check and len(results) > 0 and results[-1].returncode != 0:
+            last = results[-1]
+            raise subprocess.CalledProcessError(last.returncode, last.args,
+                                                last.stdout, last.stderr)
+
+        # The script stopped before running every command (e.g. the remote
+        # shell died or the connection dropped).
+        if len(results) != len(cmds):
+            raise subprocess.CalledProcessError(res.returncode, script,
+                                                res.stdout, res.stderr)
+
+        return results
+
     def copy(self, local_path: str, remote_path: str):
         """This method transfers files from your computer to a remote target.
 
@@ -580,29 +785,109 @@ class Executor(BaseExecutor):
             local_path (str): Path to the file to transfer.
             remote_path (str): Destination path on the remote target.
         """
-        local_fullpath = local_path
-        remote_fullpath = remote_path
-        if not os.path.isabs(local_fullpath) and self._local_basedir:
-            local_fullpath = os.path.join(self._local_basedir, local_fullpath)
-        if not os.path.isabs(remote_fullpath) and self._remote_basedir:
-            remote_fullpath = os.path.join(self._remote_basedir,
-                                           remote_fullpath)
+        local_fullpath, remote_fullpath = self._copy_paths(
+            local_path, remote_path)
 
         if self.is_local:
             shutil.copy(local_fullpath, remote_fullpath)
             return
 
-        size = os.path.getsize(local_path)
-        label = "Transfer %s to %s" % (local_path, remote_path)
-        self._dispatcher.emit('file_transfer.start', size=size, label=label)
+        with open(local_fullpath, 'rb') as fl:
+            size = os.fstat(fl.fileno()).st_size
+            label = "Transfer %s to %s" % (local_path, remote_path)
+            self._dispatcher.emit('file_transfer.start',
+                                  size=size,
+                                  label=label)
+
+            update = _progress_emitter(self._dispatcher, size)
+            fn = lambda current, _: update(current)
+
+            # putfo() writes to the remote file in pipelined mode, such that
+            # chunks are sent without waiting for the server to acknowledge
+            # each of them.
+            try:
+                self.sftp.putfo(fl,
+                                remote_fullpath,
+                                file_size=size,
+                                callback=fn)
+            finally:
+                self._dispatcher.emit('file_transfer.end')
+
+    def copy_many(self, paths: List[Tuple[str, str]], parallelism: int = 4):
+        """Transfer many files from your computer to a remote target.
+
+        In remote mode, the files are spread over several SFTP channels opened
+        on the same SSH connection, such that small files don't wait for each
+        other's acks and large ones use more of the available bandwidth. A
+        single file_transfer.start/end pair of events is emitted, with
+        file_transfer.update events tracking the bytes sent for all the files.
 
-        fn = lambda current, total: self._dispatcher.emit(
-            'file_transfer.update', current=current, total=total)
+        Args:
+            paths (List[Tuple[str, str]]):
+                List of (local_path, remote_path) to transfer. See copy().
+            parallelism (int):
+                Maximum number of files transferred at once.
 
+        Raises:
+            paramiko.SSHException: When one of the transfers fails.
+        """
+        if self.is_local or len(paths) <= 1 or parallelism <= 1:
+            return super().copy_many(paths)
+
+        transfers = [self._copy_paths(local, remote) for local, remote in paths]
+        sizes = [os.stat(local).st_size for local, _ in transfers]
+        sent = [0] * len(transfers)
+        sent_total = 0
+        update = _progress_emitter(self._dispatcher, sum(sizes))
+        lock = threading.Lock()
+
+        def transfer(i: int):
+            def on_progress(current: int, _: int):
+                nonlocal sent_total
+                # Events are emitted under the lock, as listeners (e.g.
+                # progress bars) aren't expected to be thread-safe.
+                with lock:
+                    sent_total += current - sent[i]
+                    sent[i] = current
+                    update(sent_total)
+
+            sftp = sftp_clients.get()
+            try:
+                local, remote = transfers[i]
+                with open(local, 'rb') as fl:
+                    sftp.putfo(fl,
+                               remote,
+                               file_size=sizes[i],
+                               callback=on_progress)
+            finally:
+                sftp_clients.put(sftp)
+
+        parallelism = min(parallelism, len(transfers))
+        sftp_clients = queue.Queue()  # type: queue.Queue[paramiko.SFTPClient]
         try:
-            self.sftp.put(local_fullpath, remote_fullpath, callback=fn)
+            # Channels are opened within the try block, such that those
+            # already opened are closed if the server refuses the next ones
+            # (e.g. due to its MaxSessions limit).
+            for _ in range(parallelism):
+                sftp_clients.put(self.ssh.open_sftp())
+
+            label = 'Transfer %d files' % (len(transfers))
+            self._dispatcher.emit('file_transfer.start',
+                                  size=sum(sizes),
+                                  label=label)
+            try:
+                with concurrent.futures.ThreadPoolExecutor(parallelism) as pool:
+                    list(pool.map(transfer, range(len(transfers))))
+            finally:
+                self._dispatcher.emit('file_transfer.end')
         finally:
-            self._dispatcher.emit('file_transfer.end')
+            while not sftp_clients.empty():
+                sftp_clients.get().close()
+
+    def _copy_paths(self, local_path: str,
+                    remote_path: str) -> Tuple[str, str]:
+        return (_resolve_path(self._local_basedir, local_path),
+                _resolve_path(self._remote_basedir, remote_path))
 
     def mkdtemp(self,
                 suffix: Optional[str] = None,
@@ -633,9 +918,10 @@ class Executor(BaseExecutor):
 
         prefix = prefix or ''
         suffix = suffix or ''
-        filename_tpl = os.path.join('/tmp', prefix + 'XXXXXXXX' + suffix)
-        res = self._remote("mktemp -d %s" % (filename_tpl))
-        return res.stdout
+        filename_tpl = os.path.join(dir or '/tmp',
+                                    prefix + 'XXXXXXXX' + suffix)
+        res = self._remote(['mktemp', '-d', filename_tpl], pipe=True)
+        return res.stdout.rstrip('\r\n')
 
     def cd(self, path: str):
         if self.is_remote:
@@ -644,10 +930,9 @@ class Executor(BaseExecutor):
 
     @contextmanager
     def local_cd(self, path: str):
-        if not os.path.isabs(path):
-            # @TODO: the original basedir set in the constructor should be resolved
-            # into absolute path in some way or another
-            path = self._join_paths(self._local_basedir, path)
+        # @TODO: the original basedir set in the constructor should be resolved
+        # into absolute path in some way or another
+        path = _resolve_path(self._local_basedir, path)
 
         previous_basedir = self._local_basedir
         try:
@@ -658,10 +943,9 @@ class Executor(BaseExecutor):
 
     @contextmanager
     def _remote_cd(self, path: str):
-        if not os.path.isabs(path):
-            # @TODO: the original basedir set in the constructor should be resolved
-            # into absolute path in some way or another
-            path = self._join_paths(self._remote_basedir, path)
+        # @TODO: the original basedir set in the constructor should be resolved
+        # into absolute path in some way or another
+        path = _resolve_path(self._remote_basedir, path)
 
         previous_basedir = self._remote_basedir
         try:
@@ -670,20 +954,22 @@ class Executor(BaseExecutor):
         finally:
             self._remote_basedir = previous_basedir
 
-    # @TODO: Switch to pathlib to better manage paths?
-    def _join_paths(self, *paths: Optional[str]):
-        parts = [path for path in paths if path]
-        return os.path.join(*parts)
-
     def path_exists(self, path: str) -> bool:
         """Check if the given path exists. In local mode, it uses
-        `os.path.exists` and `ls` in remote mode.
+        `os.path.exists` and a SFTP stat in remote mode (such that no shell
+        is spawned on the remote host). Relative paths are resolved against
+        the current basedir, like the commands run by this executor.
         """
         if self.is_local:
-            return os.path.exists(path)
+            return os.path.exists(_resolve_path(self._local_basedir, path))
 
-        res = self._remote("ls %s 1>/dev/null 2>&1" % (path), check=False)
-        return res.returncode == 0
+        # SFTP resolves relative paths against the login directory, while
+        # commands are run from the remote basedir.
+        try:
+            self.sftp.stat(_resolve_path(self._remote_basedir, path))
+        except IOError:
+            return False
+        return True
 
     @property
     def is_local(self) -> bool:
@@ -708,13 +994,113 @@ class Executor(BaseExecutor):
         return self._remote_basedir
 
     def mkdir(self, path: str):
-        if not os.path.isabs(path):
-            path = self._join_paths(self._remote_basedir, path)
-
+        path = _resolve_path(self._remote_basedir, path)
         res = self._remote("mkdir -p %s" % (path))
         return res.stdout
 
 
+# @TODO: Switch to pathlib to better manage paths?
+def _resolve_path(basedir: Optional[str], path: str) -> str:
+    """Resolve path relative to basedir, unless it's absolute or there's no
+    basedir. This is the same as os.path.join() for POSIX paths, without its
+    generic separator handling, as it's called for every copied file.
+    """
+    if not basedir or path[:1] == '/':
+        return path
+    return basedir.rstrip('/') + '/' + path
+
+
+def _progress_emitter(dispatcher: Dispatcher,
+                      total: int) -> Callable[[int], None]:
+    """Return a function emitting file_transfer.update events for a transfer
+    of total bytes, skipping the updates too close to the previous one.
+    """
+    step = max(total // _TRANSFER_UPDATES, _MIN_TRANSFER_UPDATE_STEP)
+    last = 0
+
+    def update(current: int):
+        nonlocal last
+        if current - last < step and current < total:
+            return
+
+        last = current
+        dispatcher.emit('file_transfer.update', current=current, total=total)
+
+    return update
+
+
+def _load_system_host_keys() -> 'paramiko.HostKeys':
+    import paramiko
+
+    path = os.path.expanduser('~/.ssh/known_hosts')
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return paramiko.HostKeys()
+
+    return _parse_host_keys_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_host_keys_file(path: str, mtime_ns: int,
+                          size: int) -> 'paramiko.HostKeys':
+    """Parse the known_hosts file at the given path. See
+    _parse_ssh_config_file() about mtime_ns and size args.
+    """
+    import paramiko
+
+    host_keys = paramiko.HostKeys()
+    try:
+        host_keys.load(path)
+    except IOError:
+        pass
+
+    return host_keys
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_ssh_config_file(path: str, mtime_ns: int,
+                           size: int) -> 'paramiko.SSHConfig':
+    """Parse the OpenSSH config file at the given path. The mtime_ns and size
+    args are only used as part of the cache key, such that the cache gets
+    invalidated whenever the file is changed.
+    """
+    import paramiko
+
+    ssh_config = paramiko.SSHConfig()
+    with open(path) as f:
+        ssh_config.parse(f)
+
+    return ssh_config
+
+
+def _output_handlers(
+    pipe: bool, stdout: bytearray, stderr: bytearray
+) -> Tuple[Callable[[bytes], Any], Callable[[bytes], Any]]:
+    """Return the functions handling the stdout and stderr chunks read from
+    an SSH channel: in pipe mode, they're appended to stdout/stderr buffers,
+    otherwise they're written as is to kitipy stdout/stderr. This is decided
+    once per command rather than for every chunk.
+    """
+    if pipe:
+        return stdout.extend, stderr.extend
+    return (functools.partial(_write_output, sys.stdout),
+            functools.partial(_write_output, sys.stderr))
+
+
+def _write_output(stream: IO[str], chunk: bytes):
+    # Text streams might have no underlying binary buffer (e.g. when they're
+    # replaced for testing purpose).
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is None:
+        stream.write(chunk.decode(errors='replace'))
+        return
+
+    stream.flush()
+    buffer.write(chunk)
+    buffer.flush()
+
+
 def _create_executor(config: Dict, stage_name: str,
                      dispatcher: Dispatcher) -> Executor:
     """Instantiate a new executor for the given stage.
@@ -759,37 +1145,19 @@ def _create_executor(config: Dict, stage_name: str,
     return Executor(dispatcher, **params)
 
 
-class InteractiveWarningPolicy(paramiko.MissingHostKeyPolicy):
-    """InteractiveWarningPolicy implements a paramiko MissingHostKeyPolicy
-    that uses click.confirmation() helper to ask for confirmation when a new
-    host_key is detected. This is the default paramiko MissingHostKeyPolicy
-    used by kitipy.
-    """
-
-    def missing_host_key(self, client, hostname, key):
-        confirm_msg = "WARNING: Host key for %s not found (%s). Do you want to add it to your ~/.ssh/known_hosts?" % (
-            hostname, key)
-
-        if not click.confirm(confirm_msg):
-            raise RuntimeError("Unknown host key for %s." % (hostname))
-
-        client._host_keys.add(hostname, key.get_name(), key)
-        if client._host_keys_filename is not None:
-            client.save_host_keys(client._host_keys_filename)
-
-
 class ProxyExecutor(BaseExecutor):
+    __slots__ = ('_executor', )
 
     def __init__(self, executor: BaseExecutor):
         self._executor = executor
 
     def local(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -800,11 +1168,11 @@ class ProxyExecutor(BaseExecutor):
 
     def run(
             self,
-            cmd: str,
+            cmd: Union[str, List[str]],
             env: Optional[Dict[str, str]] = None,
             cwd: Optional[str] = None,
             shell: bool = True,
-            input: Optional[str] = None,
+            input: Optional[Union[str, bytes]] = None,
             text: bool = True,
             encoding: Optional[str] = None,
             pipe: bool = False,
@@ -813,9 +1181,18 @@ class ProxyExecutor(BaseExecutor):
         return self._executor.run(cmd, env, cwd, shell, input, text, encoding,
                                   pipe, check)
 
+    def run_batch(self,
+                  cmds: List[Union[str, List[str]]],
+                  env: Optional[Dict[str, str]] = None,
+                  check: bool = True) -> List[subprocess.CompletedProcess]:
+        return self._executor.run_batch(cmds, env, check)
+
     def copy(self, local_path: str, remote_path: str):
         return self._executor.copy(local_path, remote_path)
 
+    def copy_many(self, paths: List[Tuple[str, str]], parallelism: int = 4):
+        return self._executor.copy_many(paths, parallelism)
+
     def mkdtemp(self,
                 suffix: Optional[str] = None,
                 prefix: Optional[str] = None,
@@ -1,7 +1,9 @@
-import functools
 from typing import Callable, TypeVar
 
 T = TypeVar('T')
 
 def pipe(nullary_fn: Callable[[], T], *unary_fns: Callable[[T], T]) -> T:
-    return functools.reduce(lambda out, fn: fn(out), unary_fns, nullary_fn())
+    out = nullary_fn()
+    for fn in unary_fns:
+        out = fn(out)
+    return out
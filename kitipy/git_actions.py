@@ -13,17 +13,19 @@ def ensure_tag_exists(kctx: kitipy.Context, tag: str):
         ValueError: If the given Git tag does not exist either on local or
             remote origin.
     """
-    res = kctx.local(
-        'git ls-remote --exit-code --tags origin refs/tags/%s >/dev/null 2>&1'
-        % (tag),
-        check=False)
+    ref = 'refs/tags/%s' % (tag)
+    res = kctx.local(['git', 'ls-remote', '--exit-code', '--tags', 'origin', ref],
+                     shell=False,
+                     pipe=True,
+                     check=False)
     if res.returncode != 0:
         kctx.fail("The given tag is not available on Git remote origin.")
 
-    res = kctx.local(
-        'git ls-remote --exit-code --tags ./. refs/tags/%s >/dev/null 2>&1' %
-        (tag),
-        check=False)
+    # Unlike ls-remote, show-ref directly reads the refs of the local repo.
+    res = kctx.local(['git', 'show-ref', '--verify', '--quiet', ref],
+                     shell=False,
+                     pipe=True,
+                     check=False)
     if res.returncode != 0:
         kctx.fail(
             "The given tag is not available in your local Git repo. Please fetch remote tags before running this task again."
@@ -38,12 +40,16 @@ def ensure_tag_is_recent(kctx: kitipy.Context, tag: str, last: int = 5):
         kctx (kitipy.Context): Kitipy Context.
         tag (str): Tag to look for.
     """
-    res = kctx.local(
-        "git for-each-ref --format='%%(refname:strip=2)' --sort=committerdate 'refs/tags/*' 2>/dev/null | tail -n%d | grep %s >/dev/null 2>&1"
-        % (last, tag),
-        check=False,
-    )
-    if res.returncode != 0:
+    # for-each-ref sorts and truncates the tag list itself, such that a single
+    # git process is spawned, with no shell pipeline.
+    res = kctx.local([
+        'git', 'for-each-ref', '--format=%(refname:strip=2)',
+        '--sort=-committerdate', '--count=%d' % (last), 'refs/tags/*'
+    ],
+                     shell=False,
+                     pipe=True,
+                     check=False)
+    if res.returncode != 0 or tag not in res.stdout.splitlines():
         kctx.fail(
             'This tag seems too old: at least %d new tags have been released since %s.'
             % (last, tag))
@@ -3,12 +3,11 @@ import contextlib
 import functools
 import os
 import subprocess
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
-from . import filters
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from .context import Context, pass_context, get_current_context
 from .dispatcher import Dispatcher
 from .exceptions import TaskError
-from .executor import Executor, _create_executor
+from .executor import Executor
 from .utils import load_config_file, normalize_config, set_up_file_transfer_listeners
 
 
@@ -73,7 +72,7 @@ class Task(click.Command):
         for filter in self.filters:
             if not filter(click_ctx):
                 return False
-        return self.hidden != True
+        return not self.hidden
 
     def invoke(self, click_ctx: click.Context):
         """Given a context, this invokes the attached callback (if it exists)
@@ -142,6 +141,8 @@ class Group(click.Group):
         self._transparents = {}  # type: Dict[str, click.MultiCommand]
         self._resolved = {
         }  # type: Dict[str, Tuple[click.Command, click.MultiCommand]]
+        self._sorted_names = []  # type: List[str]
+        self._is_resolved = False
 
         for group in transparents:
             self.add_transparent_group(group)
@@ -151,7 +152,7 @@ class Group(click.Group):
         return list(self._transparents.values())
 
     def add_command(self, cmd, name=None):
-        if len(self._resolved) > 0:
+        if self._is_resolved:
             raise RuntimeError(
                 "This task group structure has already been resolved, you can't merge or add new tasks or commands at this point."
             )
@@ -162,7 +163,7 @@ class Group(click.Group):
             super().add_command(cmd, name)
 
     def add_transparent_group(self, group: click.MultiCommand):
-        if len(self._resolved) > 0:
+        if self._is_resolved:
             raise RuntimeError(
                 "This task group structure has already been resolved, you can't add new transparent groups at this point."
             )
@@ -211,47 +212,38 @@ class Group(click.Group):
         for filter in self.filters:
             if not filter(click_ctx):
                 return False
-        return self.hidden != True
+        return not self.hidden
 
     def _resolve_commands(self, click_ctx: click.Context):
-        if len(self._resolved) > 0:
+        if self._is_resolved:
             return self._resolved
 
-        commands = self._filter_command_list(click_ctx, self)
-        if len(commands) > 0:
-            names, origs, cmds = zip(*commands)
-        else:
-            names, origs, cmds = ((), (), ())
-
-        origins = dict(zip(names,
-                           origs))  # type: Dict[str, click.MultiCommand]
-        resolved = dict(
-            zip(names, zip(cmds, origs)
-                ))  # type: Dict[str, Tuple[click.Command, click.MultiCommand]]
+        resolved = {
+            name: (cmd, orig)
+            for name, orig, cmd in self._filter_command_list(click_ctx, self)
+        }  # type: Dict[str, Tuple[click.Command, click.MultiCommand]]
 
         for group_name, group in self._transparents.items():
             subcommands = self._filter_command_list(click_ctx, group)
 
-            if len(subcommands) > 0:
-                sub_names, sub_origs, sub_cmds = zip(*subcommands)
-            else:
-                sub_names, sub_origs, sub_cmds = ((), (), ())
-
-            # @TODO: check if the subcommand
-            colliding = list(set(origins.keys()) & set(sub_names))
+            # Names are directly looked up in resolved, which also keeps track
+            # of the group each command comes from.
+            colliding = [name for name, _, _ in subcommands if name in resolved]
             if len(colliding) > 0:
                 error = ', '.join([
-                    '"%s" from "%s"' % (cmd_name, origins[cmd_name].name)
+                    '"%s" from "%s"' % (cmd_name, resolved[cmd_name][1].name)
                     for cmd_name in colliding
                 ])
                 raise RuntimeError(
                     'The transparent group "%s" adds command(s) colliding with: %s.'
                     % (group.name, error))
 
-            resolved.update(dict(zip(sub_names, zip(sub_cmds, sub_origs))))
-            origins.update(dict(zip(sub_names, sub_origs)))
+            resolved.update(
+                (name, (cmd, orig)) for name, orig, cmd in subcommands)
 
         self._resolved = resolved
+        self._sorted_names = sorted(resolved)
+        self._is_resolved = True
         return self._resolved
 
     def _filter_command_list(
@@ -261,9 +253,12 @@ class Group(click.Group):
         filtered = [
         ]  # type: List[Tuple[str, click.MultiCommand, click.Command]]
 
+        # super() proxies resolve attributes through the MRO on each access,
+        # thus get_command() is bound once for the whole loop.
+        get_command = cmd_group.get_command  # type: ignore
         commands = cmd_group.list_commands(click_ctx)  # type: ignore
         for cmd_name in commands:
-            cmd = cmd_group.get_command(click_ctx, cmd_name)  # type: ignore
+            cmd = get_command(click_ctx, cmd_name)
             if cmd is None:
                 continue
 
@@ -304,8 +299,11 @@ class Group(click.Group):
 
         You generally don't need to call it by yourself.
         """
-        commands = self._resolve_commands(click_ctx).keys()
-        return sorted(commands)
+        # Click calls this method several times per help message, while the
+        # resolved commands can't change anymore.
+        if not self._is_resolved:
+            self._resolve_commands(click_ctx)
+        return self._sorted_names
 
     def get_help(self, click_ctx: click.Context):
         if self.invoke_on_help:
@@ -331,25 +329,29 @@ class Group(click.Group):
 
     def format_commands(self, click_ctx: click.Context, formatter):
         """Format Commands section for the help message."""
-        for group_name, group in self._transparents.items():
-            subcommands = group.list_commands(click_ctx)
-            self._print_group_help_section(click_ctx, group_name, group,
-                                           subcommands, formatter)
-
-        resolved = self._resolve_commands(click_ctx).values()
-        subcommands = [cmd.name for cmd, group in resolved if group is self]
-        self._print_group_help_section(click_ctx, 'Commands', self,
-                                       sorted(subcommands), formatter)
+        resolved = self._resolve_commands(click_ctx)
 
-    def _print_group_help_section(self, click_ctx: click.Context,
-                                  section_name: str, group, subcommands,
+        # Commands are listed in a section named after the transparent group
+        # they come from, or in the last one when they belong to this group.
+        sections = [
+            (name, []) for name in list(self._transparents) + ['Commands']
+        ]  # type: List[Tuple[str, List[Tuple[str, click.Command]]]]
+        indexes = {
+            group: i
+            for i, group in enumerate(self._transparents.values())
+        }
+        for cmd_name in self.list_commands(click_ctx):
+            cmd, origin = resolved[cmd_name]
+            index = indexes.get(origin, len(sections) - 1)
+            sections[index][1].append((cmd_name, cmd))
+
+        for section_name, commands in sections:
+            self._print_group_help_section(section_name, commands, formatter)
+
+    def _print_group_help_section(self, section_name: str,
+                                  commands: List[Tuple[str, click.Command]],
                                   formatter):
         # This code comes from click.MultiCommand.format_commands()
-        commands = []
-        for subcommand in subcommands:
-            cmd = group.get_command(click_ctx, subcommand)
-            if cmd is not None:
-                commands.append((subcommand, cmd))
 
         # allow for 3 times the default spacing
         if len(commands):
@@ -515,6 +517,7 @@ class StageGroup(click.MultiCommand):
         self._stages = {}  # type: Dict[str, Group]
         self._all = self._create_stage('all')
         self._resolved = {}  # type: Dict[str, click.Command]
+        self._is_resolved = False
 
     @property
     def all(self):
@@ -540,7 +543,7 @@ class StageGroup(click.MultiCommand):
         return group(stage_name, **args)(callback)
 
     def _resolve_commands(self, click_ctx: click.Context):
-        if len(self._resolved) > 0:
+        if self._is_resolved:
             return self._resolved
 
         kctx = get_current_context(click_ctx)
@@ -554,6 +557,7 @@ class StageGroup(click.MultiCommand):
             stages[name] = (group, self)
 
         self._resolved = stages  # type: ignore
+        self._is_resolved = True
         return self._resolved
 
     def stage(self, name, **attrs):
@@ -593,6 +597,7 @@ class StackGroup(click.MultiCommand):
         self._stacks = {}  # type: Dict[str, Group]
         self._all = self._create_stack('all')
         self._resolved = {}  # type: Dict[str, click.Command]
+        self._is_resolved = False
 
     @property
     def all(self):
@@ -621,7 +626,7 @@ class StackGroup(click.MultiCommand):
         return group(stack_name, **args)(callback)
 
     def _resolve_commands(self, click_ctx: click.Context):
-        if len(self._resolved) > 0:
+        if self._is_resolved:
             return self._resolved
 
         kctx = get_current_context(click_ctx)
@@ -635,6 +640,7 @@ class StackGroup(click.MultiCommand):
             stacks[name] = (group, self)
 
         self._resolved = stacks  # type: ignore
+        self._is_resolved = True
         return self._resolved
 
     def stack(self, name, **attrs):
@@ -795,9 +801,9 @@ class RootCommand(Group):
 
         stages = config['stages'].values()
         if len(stages) == 1:
-            stage = list(stages)[0]
+            stage = next(iter(stages))
             self.stage = stage['name']
-        if len(stages) > 1:
+        elif len(stages) > 1:
             stage = next((stage for stage in stages if stage.get('default')),
                          None)
             if stage is None:
@@ -808,7 +814,7 @@ class RootCommand(Group):
 
         stacks = config['stacks'].values()
         if len(stacks) == 1:
-            stack_cfg = list(stacks)[0]
+            stack_cfg = next(iter(stacks))
             self.stack = stack_cfg['name']
 
     def make_context(self, info_name, args, parent=None, **extra):
@@ -833,7 +839,9 @@ class RootCommand(Group):
                                        parent=parent,
                                        **extra)
         executor = Executor(self._dispatcher)
-        self.click_ctx.obj = Context(self._config, executor, self._dispatcher)
+        kctx = Context(self._config, executor, self._dispatcher)
+        self.click_ctx.obj = kctx
+        self.click_ctx.call_on_close(kctx.close)
 
         with self.click_ctx.scope(cleanup=False):
             self.parse_args(self.click_ctx, args)
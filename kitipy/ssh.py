@@ -0,0 +1,21 @@
+import click
+import paramiko
+
+
+class InteractiveWarningPolicy(paramiko.MissingHostKeyPolicy):
+    """InteractiveWarningPolicy implements a paramiko MissingHostKeyPolicy
+    that uses click.confirmation() helper to ask for confirmation when a new
+    host_key is detected. This is the default paramiko MissingHostKeyPolicy
+    used by kitipy.
+    """
+
+    def missing_host_key(self, client, hostname, key):
+        confirm_msg = "WARNING: Host key for %s not found (%s). Do you want to add it to your ~/.ssh/known_hosts?" % (
+            hostname, key)
+
+        if not click.confirm(confirm_msg):
+            raise RuntimeError("Unknown host key for %s." % (hostname))
+
+        client._host_keys.add(hostname, key.get_name(), key)
+        if client._host_keys_filename is not None:
+            client.save_host_keys(client._host_keys_filename)
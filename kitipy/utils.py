@@ -1,12 +1,16 @@
 import click
+import concurrent.futures
+import copy
+import functools
 import kitipy
 import os.path
 import time
 import yaml
 import subprocess
 import sys
-from typing import Callable, Dict, List, Optional, TypeVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
 from .exceptions import TaskError
+from .executor import _create_executor
 
 
 def load_config_file(path: str) -> Dict:
@@ -28,6 +32,20 @@ def load_config_file(path: str) -> Dict:
     if not os.path.exists(path):
         raise click.BadParameter('No file "%s" found.' % (path))
 
+    # The parsed config is cached as long as the file isn't modified, but each
+    # caller gets its own copy since normalize_config() mutates it in place.
+    stat = os.stat(path)
+    config = _load_yaml_file(path, stat.st_mtime_ns, stat.st_size)
+
+    return copy.deepcopy(config)
+
+
+@functools.lru_cache(maxsize=16)
+def _load_yaml_file(path: str, mtime_ns: int, size: int) -> Dict:
+    """Parse the YAML file at the given path. The mtime_ns and size args are
+    only used as part of the cache key, such that the cache gets invalidated
+    whenever the file is changed.
+    """
     with open(path, 'r') as f:
         config = yaml.safe_load(f)
         config['path'] = path
@@ -157,27 +175,61 @@ def append_cmd_flags(cmd: str, **kwargs) -> str:
         str: The given cmd with short_flags and long_flags appended.
     """
 
+    parts = [cmd]
     for name, value in kwargs.items():
+        if value is None:
+            continue
+
         name = name.replace('_', '-')
         sep = ' ' if len(name) == 1 else '='
         name = '-' + name if len(name) == 1 else '--' + name
+        values = value if type(value) == tuple else (value, )
+
+        for single_value in values:
+            if type(single_value) == bool:
+                parts.append(name)
+            else:
+                parts.append('%s%s%s' % (name, sep, single_value))
 
+    return ' '.join(parts)
+
+
+def append_cmd_args(args: Sequence[str], **kwargs) -> List[str]:
+    """Build a list of command args by appending flags in kwargs. This is the
+    counterpart of append_cmd_flags() for commands run without a shell: each
+    flag and each value is a separate arg, such that values never have to be
+    quoted.
+
+    Args:
+        args (Sequence[str]):
+            The base command and args to append flags to. This is left
+            untouched, so it can be a constant shared by every call.
+        **kwargs:
+            List of flags to append to the command. See append_cmd_flags()
+            for details about how they're formatted.
+
+    Returns:
+        List[str]: A new list made of the given args and the flags.
+    """
+    args = list(args)
+    for name, value in kwargs.items():
         if value is None:
             continue
-        if type(value) == tuple:
-            for single_value in value:
-                cmd = _append_cmd_flag(cmd, name, single_value, sep)
-        else:
-            cmd = _append_cmd_flag(cmd, name, value, sep)
-
-    return cmd
 
+        name = name.replace('_', '-')
+        short = len(name) == 1
+        name = '-' + name if short else '--' + name
+        values = value if type(value) == tuple else (value, )
 
-def _append_cmd_flag(cmd: str, name: str, value, sep: str) -> str:
-    if type(value) == bool:
-        return cmd + " %s" % (name)
+        for single_value in values:
+            if type(single_value) == bool:
+                args.append(name)
+            elif short:
+                args.extend((name, str(single_value)))
+            else:
+                args.append('%s=%s' % (name, single_value))
 
-    return cmd + " %s%s%s" % (name, sep, value)
+    return args
 
 
 TesterResult = TypeVar('TesterResult', subprocess.CompletedProcess, bool, None)
@@ -283,3 +335,58 @@ def invoke_tree(root: click.Group, subcommands: List[str]):
     click_ctx.args = subcommands[1:]
     click_ctx.protected_args = subcommands[:1]
     root.invoke(click_ctx)
+
+
+StageResult = TypeVar('StageResult')
+
+
+def parallel_map(kctx: kitipy.Context,
+                 fn: Callable[[kitipy.Context], StageResult],
+                 stage_names: Iterable[str],
+                 max_workers: Optional[int] = None) -> List[StageResult]:
+    """Call fn concurrently for each of the given stages and return their
+    results in the same order as stage_names.
+
+    Each call receives its own kitipy.Context, bound to the stage and to a
+    dedicated executor (thus its own SSH connection for remote stages). fn
+    runs in a worker thread, where there's no current click context: it has
+    to use the kitipy.Context it receives rather than get_current_context().
+
+    This is mostly useful to run long commands (e.g. Ansible playbooks or
+    deployments) on several stages at once, as workers spend their time
+    waiting for subprocesses and SSH channels.
+
+    Args:
+        kctx (kitipy.Context):
+            The context whose config and dispatcher are used by the stage
+            contexts.
+        fn (Callable[[kitipy.Context], StageResult]):
+            The function to call for each stage.
+        stage_names (Iterable[str]):
+            The name of the stages fn should be called for.
+        max_workers (Optional[int]):
+            Maximum number of stages processed at once. Defaults to
+            concurrent.futures.ThreadPoolExecutor default.
+
+    Raises:
+        click.BadParameter: When one of the stages is not properly configured.
+
+    Returns:
+        List[StageResult]: The value returned by fn for each stage.
+    """
+    stage_ctxs = [
+        kitipy.Context(kctx.config,
+                       _create_executor(kctx.config, name, kctx.dispatcher),
+                       kctx.dispatcher,
+                       stage=kctx.config['stages'][name])
+        for name in stage_names
+    ]
+    if len(stage_ctxs) == 0:
+        return []
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            return list(pool.map(fn, stage_ctxs))
+    finally:
+        for stage_ctx in stage_ctxs:
+            stage_ctx.executor.close()
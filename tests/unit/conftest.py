@@ -0,0 +1,16 @@
+import os
+import pytest
+
+
+@pytest.fixture
+def docker_stub(tmp_path, monkeypatch):
+    """Put on PATH a fake docker binary that echoes its args and fails for
+    images named missing.
+    """
+    docker = tmp_path / 'docker'
+    docker.write_text('#!/bin/sh\n'
+                      'case "$*" in *missing:*) exit 1 ;; esac\n'
+                      'echo "$*"\n')
+    docker.chmod(0o755)
+    monkeypatch.setenv('PATH',
+                       '%s%s%s' % (tmp_path, os.pathsep, os.environ['PATH']))
@@ -0,0 +1,61 @@
+import kitipy
+import os
+from unittest import mock
+from kitipy import ansible_actions
+
+
+def test_run_playbook_runs_ansible_playbook_without_shell():
+    kctx = mock.Mock(spec=kitipy.Context)
+
+    ansible_actions.run_playbook(kctx,
+                                 'inventory.yml',
+                                 'deploy.yml',
+                                 hosts=('web1', 'web2'),
+                                 tags=('app', ),
+                                 ask_become_pass=True,
+                                 forks=20,
+                                 pipelining=False)
+
+    kctx.local.assert_called_once_with([
+        'ansible-playbook', '-i', 'inventory.yml', '-l', 'web1,web2', '-t',
+        'app', '--ask-become-pass', '-f', '20', 'deploy.yml'
+    ],
+                                       env=None,
+                                       shell=False)
+
+
+def test_run_playbook_skips_empty_hosts_and_tags():
+    kctx = mock.Mock(spec=kitipy.Context)
+
+    ansible_actions.run_playbook(kctx,
+                                 'inventory.yml',
+                                 'deploy.yml',
+                                 hosts=(),
+                                 tags=(),
+                                 pipelining=False)
+
+    kctx.local.assert_called_once_with(
+        ['ansible-playbook', '-i', 'inventory.yml', 'deploy.yml'],
+        env=None,
+        shell=False)
+
+
+def test_run_playbook_enables_pipelining_by_default():
+    kctx = mock.Mock(spec=kitipy.Context)
+
+    with mock.patch.dict(os.environ, {'FOO': 'bar'}):
+        os.environ.pop('ANSIBLE_PIPELINING', None)
+        ansible_actions.run_playbook(kctx, 'inventory.yml', 'deploy.yml')
+
+    env = kctx.local.call_args[1]['env']
+    assert env['ANSIBLE_PIPELINING'] == '1'
+    assert env['FOO'] == 'bar'
+
+
+def test_run_playbook_does_not_override_pipelining_env_var():
+    kctx = mock.Mock(spec=kitipy.Context)
+
+    with mock.patch.dict(os.environ, {'ANSIBLE_PIPELINING': '0'}):
+        ansible_actions.run_playbook(kctx, 'inventory.yml', 'deploy.yml')
+
+    assert kctx.local.call_args[1]['env'] is None
@@ -67,3 +67,234 @@ def test_context_run():
 
     executor.run.assert_called_once_with('some cmd', {"FOO": "bar"}, None, True,
                                          None, True, None, True, False)
+
+
+def test_context_invoke_passes_default_param_values():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    callback = mock.Mock()
+    cmd = click.Command('foo',
+                        callback=callback,
+                        params=[click.Option(['--bar'], default='baz')])
+
+    with click.Context(click.Command('root'), obj=kctx):
+        kctx.invoke(cmd)
+        kctx.invoke(cmd)
+        kctx.invoke(cmd, bar='qux')
+
+    callback.assert_has_calls(
+        [mock.call(bar='baz'),
+         mock.call(bar='baz'),
+         mock.call(bar='qux')])
+
+
+def test_context_invoke_reuses_parent_param_values():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    callback = mock.Mock()
+    cmd = click.Command('foo',
+                        callback=callback,
+                        params=[click.Option(['--bar'], default='baz')])
+
+    with click.Context(click.Command('root'), obj=kctx) as click_ctx:
+        click_ctx.params = {'bar': 'from-parent'}
+        kctx.invoke(cmd)
+
+    callback.assert_called_once_with(bar='from-parent')
+
+
+def test_context_invoke_evaluates_callable_defaults_on_each_call():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    callback = mock.Mock()
+    default = mock.Mock(side_effect=['first', 'second'])
+    cmd = click.Command('foo',
+                        callback=callback,
+                        params=[click.Option(['--bar'], default=default)])
+
+    with click.Context(click.Command('root'), obj=kctx):
+        kctx.invoke(cmd)
+        kctx.invoke(cmd)
+
+    callback.assert_has_calls([mock.call(bar='first'), mock.call(bar='second')])
+
+
+def test_context_invoke_mixes_static_and_callable_defaults():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    callback = mock.Mock()
+    default = mock.Mock(side_effect=['first', 'second'])
+    cmd = click.Command('foo',
+                        callback=callback,
+                        params=[
+                            click.Option(['--bar'], default=default),
+                            click.Option(['--baz'], default='static'),
+                        ])
+
+    with click.Context(click.Command('root'), obj=kctx):
+        kctx.invoke(cmd)
+        kctx.invoke(cmd, baz='explicit')
+
+    callback.assert_has_calls([
+        mock.call(bar='first', baz='static'),
+        mock.call(bar='second', baz='explicit'),
+    ])
+    assert default.call_count == 2
+
+
+def test_context_using_stage_reuses_stage_executors():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    config = {'stages': {'dev': {'name': 'dev', 'type': 'local'}}}
+    kctx = kitipy.Context(config, executor, dispatcher)
+
+    with mock.patch('kitipy.context._create_executor') as create_executor:
+        stage_executor = mock.Mock(spec=kitipy.Executor)
+        create_executor.return_value = stage_executor
+
+        with kctx.using_stage('dev'):
+            assert kctx.executor is stage_executor
+            assert kctx.stage == config['stages']['dev']
+        with kctx.using_stage('dev'):
+            assert kctx.executor is stage_executor
+
+        create_executor.assert_called_once_with(config, 'dev', dispatcher)
+
+    assert kctx.executor is executor
+    assert kctx.stage is None
+
+
+def test_context_info_warning_and_error_output_styled_messages(capsys):
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    with mock.patch('click.utils.should_strip_ansi', return_value=False):
+        kctx.info('some info')
+        kctx.warning('some warning')
+        kctx.error('some error')
+
+    expected = [
+        click.style('INFO: some info', bg='cyan', fg='black', bold=True),
+        click.style('WARNING: some warning',
+                    bg='yellow',
+                    fg='black',
+                    bold=True),
+        click.style('ERROR: some error',
+                    bg='red',
+                    fg='bright_white',
+                    bold=True),
+    ]
+    assert capsys.readouterr().err.splitlines() == expected
+
+
+def test_context_using_stack_reuses_loaded_stacks():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    config = {'stacks': {'app': {'name': 'app', 'file': 'docker-compose.yml'}}}
+    kctx = kitipy.Context(config, executor, dispatcher)
+
+    with mock.patch('kitipy.docker.stack.load_stack') as load_stack:
+        stack = mock.Mock(spec=kitipy.docker.BaseStack)
+        other_stack = mock.Mock(spec=kitipy.docker.BaseStack)
+        load_stack.side_effect = [stack, other_stack]
+
+        with kctx.using_stack('app'):
+            assert kctx.stack is stack
+        with kctx.using_stack('app'):
+            assert kctx.stack is stack
+        with kctx.using_stack('app', {'env': 'prod'}):
+            assert kctx.stack is other_stack
+
+        assert load_stack.call_count == 2
+
+    assert kctx.stack is None
+
+
+def test_context_gather_runs_every_command():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = kitipy.Executor(dispatcher)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    results = kctx.gather('echo foo', 'echo bar', pipe=True)
+
+    assert [res.stdout for res in results] == ['foo\n', 'bar\n']
+
+
+def test_context_gather_fails_when_a_command_fails():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = kitipy.Executor(dispatcher)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        kctx.gather('true', 'false')
+
+
+def test_context_invoke_commands_without_params():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    callback = mock.Mock(return_value='result')
+    cmd = click.Command('foo', callback=callback)
+
+    with click.Context(click.Command('root'), obj=kctx) as click_ctx:
+        click_ctx.params = {'bar': 'from-parent'}
+        assert kctx.invoke(cmd, 'arg', baz='qux') == 'result'
+
+    callback.assert_called_once_with('arg', baz='qux')
+
+
+def test_context_close_closes_stage_executors():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    config = {'stages': {'prod': {'name': 'prod', 'type': 'remote'}}}
+    kctx = kitipy.Context(config, executor, dispatcher)
+
+    with mock.patch('kitipy.context._create_executor') as create_executor:
+        stage_executor = mock.Mock(spec=kitipy.Executor)
+        create_executor.return_value = stage_executor
+
+        with kctx.using_stage('prod'):
+            pass
+
+    kctx.close()
+
+    stage_executor.close.assert_called_once_with()
+
+
+def test_get_current_executor_follows_executor_changes():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    other_executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    with click.Context(click.Command('root'), obj=kctx):
+        assert get_current_executor() is executor
+        with kctx.using_executor(other_executor):
+            assert get_current_executor() is other_executor
+        assert get_current_executor() is executor
+
+
+def test_context_invoke_pushes_the_invoked_command_context():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    executor = mock.Mock(spec=kitipy.Executor)
+    kctx = kitipy.Context({}, executor, dispatcher)
+
+    cmd = click.Command(
+        'foo', callback=lambda: click.get_current_context())
+
+    with click.Context(click.Command('root'), obj=kctx) as parent:
+        click_ctx = kctx.invoke(cmd)
+
+    assert click_ctx.command is cmd
+    assert click_ctx.parent is parent
+    assert click_ctx.find_object(kitipy.Context) is kctx
@@ -29,3 +29,44 @@ def test_dispatcher_calls_early_stop():
 
     listener1.assert_called_once_with(some='args')
     listener2.assert_not_called()
+
+
+def test_dispatchers_do_not_share_listeners():
+    listener = mock.Mock(return_value=True)
+
+    dispatcher1 = kitipy.Dispatcher()
+    dispatcher1.on('test', listener)
+
+    dispatcher2 = kitipy.Dispatcher()
+    dispatcher2.emit('test', some='args')
+
+    listener.assert_not_called()
+
+
+def test_dispatcher_calls_listeners_given_to_constructor():
+    listener = mock.Mock(return_value=True)
+
+    dispatcher = kitipy.Dispatcher({'test': [listener]})
+    dispatcher.emit('test', some='args')
+
+    listener.assert_called_once_with(some='args')
+
+
+def test_dispatcher_does_not_call_listeners_registered_during_emit():
+    listener2 = mock.Mock(return_value=True)
+    dispatcher = kitipy.Dispatcher()
+
+    def listener1(**kwargs):
+        dispatcher.on('test', listener2)
+        return True
+
+    dispatcher.on('test', listener1)
+    dispatcher.emit('test')
+
+    listener2.assert_not_called()
+
+
+def test_dispatcher_has_no_instance_dict():
+    dispatcher = kitipy.Dispatcher()
+
+    assert not hasattr(dispatcher, '__dict__')
@@ -0,0 +1,334 @@
+import kitipy
+import pytest
+import subprocess
+from unittest import mock
+from kitipy.docker import actions
+
+
+def test_buildx_imagetools_inspect_does_not_look_up_found_images_again():
+    executor = mock.Mock(spec=kitipy.Executor)
+    executor.run.return_value = subprocess.CompletedProcess('', 0, '', '')
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        first = actions.buildx_imagetools_inspect('foo/bar:1.0', _check=False)
+        second = actions.buildx_imagetools_inspect('foo/bar:1.0', _check=False)
+
+    executor.run.assert_called_once_with(
+        ['docker', 'buildx', 'imagetools', 'inspect', 'foo/bar:1.0'],
+        shell=False,
+        pipe=True,
+        check=False)
+    assert first is second
+
+
+def test_buildx_imagetools_inspect_looks_up_missing_images_again():
+    executor = mock.Mock(spec=kitipy.Executor)
+    executor.run.return_value = subprocess.CompletedProcess('', 1, '', '')
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.buildx_imagetools_inspect('foo/bar:1.0', _check=False)
+        actions.buildx_imagetools_inspect('foo/bar:1.0', _check=False)
+
+    assert executor.run.call_count == 2
+
+
+def test_buildx_imagetools_inspect_outputs_to_the_cli_without_pipe():
+    executor = mock.Mock(spec=kitipy.Executor)
+    executor.run.return_value = subprocess.CompletedProcess('', 0, '', '')
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.buildx_imagetools_inspect('foo/bar:1.0', _pipe=False)
+        actions.buildx_imagetools_inspect('foo/bar:1.0')
+
+    executor.run.assert_has_calls([
+        mock.call(['docker', 'buildx', 'imagetools', 'inspect', 'foo/bar:1.0'],
+                  shell=False,
+                  pipe=False,
+                  check=True),
+        mock.call(['docker', 'buildx', 'imagetools', 'inspect', 'foo/bar:1.0'],
+                  shell=False,
+                  pipe=True,
+                  check=True),
+    ])
+
+
+def test_buildx_imagetools_inspect_many_batches_unknown_images():
+    executor = mock.Mock(spec=kitipy.Executor)
+    found = subprocess.CompletedProcess('', 0, 'found', '')
+    missing = subprocess.CompletedProcess('', 1, '', 'missing')
+    executor.run_batch.side_effect = [[found, missing], [missing]]
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        first = actions.buildx_imagetools_inspect_many(
+            ['foo:1.0', 'bar:1.0', 'foo:1.0'], _check=False)
+        second = actions.buildx_imagetools_inspect_many(['foo:1.0', 'bar:1.0'],
+                                                        _check=False)
+
+    base_args = ['docker', 'buildx', 'imagetools', 'inspect']
+    executor.run_batch.assert_has_calls([
+        mock.call([base_args + ['foo:1.0'], base_args + ['bar:1.0']],
+                  check=False),
+        mock.call([base_args + ['bar:1.0']], check=False),
+    ])
+    assert first == [found, missing, found]
+    assert second == [found, missing]
+
+
+def test_buildx_imagetools_inspect_many_runs_docker_with_its_args(
+        docker_stub):
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        results = actions.buildx_imagetools_inspect_many(
+            ['foo:1.0', 'missing:1.0'], _check=False)
+
+    assert [(res.returncode, res.stdout) for res in results] == [
+        (0, 'buildx imagetools inspect foo:1.0\n'),
+        (1, ''),
+    ]
+    base_args = ('docker', 'buildx', 'imagetools', 'inspect')
+    assert list(actions._found_images[executor]) == [base_args + ('foo:1.0', )]
+
+
+def test_network_create_runs_docker_without_shell():
+    executor = mock.Mock(spec=kitipy.Executor)
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.network_create('my network', driver='overlay', attachable=True)
+
+    executor.run.assert_called_once_with([
+        'docker', 'network', 'create', '--driver=overlay', '--attachable',
+        'my network'
+    ],
+                                         shell=False,
+                                         pipe=False,
+                                         check=True)
+
+
+def test_find_service_label():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.stack = mock.Mock(spec=kitipy.docker.BaseStack)
+    kctx.stack.config = {
+        'services': {
+            'app': {
+                'labels': {
+                    'io.kitipy.foo': 'bar',
+                    'io.kitipy.foobar': 'baz',
+                },
+            },
+        },
+    }
+
+    assert actions.find_service_label(kctx, 'app', 'io.kitipy.foo') == ['bar']
+    assert actions.find_service_label(kctx, 'app', 'io.kitipy.foobar',
+                                      one=True) == 'baz'
+    assert actions.find_service_label(kctx, 'app', 'io.kitipy.missing',
+                                      one=True) is None
+
+
+def test_container_run():
+    executor = mock.Mock(spec=kitipy.Executor)
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.container_run('alpine',
+                              'echo foo',
+                              network='host',
+                              label='description=my app')
+
+    executor.run.assert_called_once_with(
+        "docker container run --network=host '--label=description=my app' --rm alpine echo foo",
+        pipe=False,
+        check=True)
+
+
+def test_container_run_without_rm():
+    executor = mock.Mock(spec=kitipy.Executor)
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.container_run('alpine', 'echo foo', rm=False)
+
+    executor.run.assert_called_once_with('docker container run alpine echo foo',
+                                         pipe=False,
+                                         check=True)
+
+
+def test_container_run_factory_reuses_flags():
+    executor = mock.Mock(spec=kitipy.Executor)
+    run = actions.container_run_factory(network='host')
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        run('alpine', 'echo foo')
+        run('debian', 'echo bar', _pipe=True, _check=False)
+
+    executor.run.assert_has_calls([
+        mock.call('docker container run --network=host --rm alpine echo foo',
+                  pipe=False,
+                  check=True),
+        mock.call('docker container run --network=host --rm debian echo bar',
+                  pipe=True,
+                  check=False),
+    ])
+
+
+def test_normalize_labels():
+    assert actions.normalize_labels({
+        'io.kitipy.foo': 'bar',
+        'traefik.port': 80,
+    }) == ['io.kitipy.foo=bar', 'traefik.port=80']
+    assert actions.normalize_labels(['io.kitipy.foo=bar'
+                                     ]) == ['io.kitipy.foo=bar']
+
+
+def test_buildx_build_does_not_modify_given_env():
+    executor = mock.Mock(spec=kitipy.Executor)
+    env = {'FOO': 'bar', 'DOCKER_BUILDKIT': '0'}
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.buildx_build('.', _env=env, tag='app:latest')
+
+    assert env == {'FOO': 'bar', 'DOCKER_BUILDKIT': '0'}
+    executor.local.assert_called_once_with(
+        ['docker', 'buildx', 'build', '--tag=app:latest', '.'],
+        cwd=None,
+        shell=False,
+        pipe=False,
+        check=True,
+        env={
+            'FOO': 'bar',
+            'DOCKER_BUILDKIT': '1',
+            'DOCKER_CLI_EXPERIMENTAL': 'enabled',
+        })
+
+
+def test_buildx_build_passes_flags_with_spaces_as_single_args():
+    executor = mock.Mock(spec=kitipy.Executor)
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        actions.buildx_build('.', label=('description=my app', ))
+
+    assert executor.local.call_args[0][0] == [
+        'docker', 'buildx', 'build', '--label=description=my app', '.'
+    ]
+
+
+def test_secret_create_sends_trimmed_secret_in_binary_mode(tmp_path):
+    executor = mock.Mock(spec=kitipy.Executor)
+    executor.run.return_value = subprocess.CompletedProcess(
+        '', 0, b'secret-id\n', b'')
+    secret_file = tmp_path / 'secret'
+    secret_file.write_bytes(b'p4ss\xc3\xa9\r\n')
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        res = actions.secret_create('db_password',
+                                    str(secret_file),
+                                    _pipe=True,
+                                    label='app')
+
+    executor.run.assert_called_once_with([
+        'docker', 'secret', 'create', '--label=app', 'db_password', '-'
+    ],
+                                         shell=False,
+                                         input=b'p4ss\xc3\xa9',
+                                         text=False,
+                                         pipe=True,
+                                         check=True)
+    assert res.stdout == 'secret-id\n'
+    assert res.stderr == ''
+
+
+def test_find_default_shell():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.stack.config = {
+        'services': {
+            'app': {
+                'labels': {
+                    'io.kitipy.docker.default_shell': '/bin/bash'
+                }
+            },
+            'db': {},
+        }
+    }
+
+    assert actions.find_default_shell(kctx, 'app') == '/bin/bash'
+    assert actions.find_default_shell(kctx, 'db') is None
+
+
+@pytest.mark.parametrize("image_ref, expected", [
+    ('alpine', ('registry-1.docker.io', 'library/alpine', 'latest')),
+    ('knplabs/app:1.0', ('registry-1.docker.io', 'knplabs/app', '1.0')),
+    ('localhost:5000/app', ('localhost:5000', 'app', 'latest')),
+    ('alpine:3.12', ('registry-1.docker.io', 'library/alpine', '3.12')),
+    ('docker.io/alpine', ('registry-1.docker.io', 'library/alpine', 'latest')),
+    ('docker.io/knplabs/app:1.0', ('registry-1.docker.io', 'knplabs/app',
+                                   '1.0')),
+    ('localhost/app:1.0', ('localhost', 'app', '1.0')),
+    ('localhost:5000/app:1.0', ('localhost:5000', 'app', '1.0')),
+    ('registry.example.com:5000/knplabs/app',
+     ('registry.example.com:5000', 'knplabs/app', 'latest')),
+    ('ghcr.io/knplabs/app@sha256:abc',
+     ('ghcr.io', 'knplabs/app', 'sha256:abc')),
+    ('ghcr.io/knplabs/app:1.0@sha256:abc',
+     ('ghcr.io', 'knplabs/app', 'sha256:abc')),
+    ('localhost:5000/app:1.0@sha256:abc',
+     ('localhost:5000', 'app', 'sha256:abc')),
+    ('alpine:3.12@sha256:abc',
+     ('registry-1.docker.io', 'library/alpine', 'sha256:abc')),
+])
+def test_parse_image_ref(image_ref, expected):
+    assert actions._parse_image_ref(image_ref) == expected
+
+
+def test_registry_manifest_exists_fetches_a_token_once(monkeypatch):
+    session = mock.Mock()
+    challenge = mock.Mock(
+        status_code=401,
+        headers={
+            'WWW-Authenticate':
+            'Bearer realm="https://auth.example.com/token",service="registry.example.com",scope="repository:app:pull"'
+        })
+    session.head.side_effect = [
+        challenge,
+        mock.Mock(status_code=200),
+        mock.Mock(status_code=404),
+    ]
+    session.get.return_value = mock.Mock(
+        status_code=200, json=mock.Mock(return_value={'token': 'secret'}))
+    monkeypatch.setattr(actions, '_registry_session', session)
+    monkeypatch.setattr(actions, '_registry_tokens', {})
+
+    assert actions.registry_manifest_exists('registry.example.com/app:1.0')
+    assert actions.registry_manifest_exists(
+        'registry.example.com/app:2.0') is False
+
+    session.get.assert_called_once_with('https://auth.example.com/token',
+                                        params={
+                                            'service': 'registry.example.com',
+                                            'scope': 'repository:app:pull',
+                                        },
+                                        timeout=10)
+    assert session.head.call_args[1]['headers'][
+        'Authorization'] == 'Bearer secret'
+    assert session.head.call_args[0][
+        0] == 'https://registry.example.com/v2/app/manifests/2.0'
+
+
+def test_registry_manifest_exists_cannot_tell_without_credentials(monkeypatch):
+    session = mock.Mock()
+    session.head.return_value = mock.Mock(
+        status_code=401, headers={'WWW-Authenticate': 'Basic realm="x"'})
+    monkeypatch.setattr(actions, '_registry_session', session)
+    monkeypatch.setattr(actions, '_registry_tokens', {})
+
+    assert actions.registry_manifest_exists('registry.example.com/app') is None
@@ -0,0 +1,26 @@
+import kitipy
+import pytest
+from unittest import mock
+from kitipy.docker import ComposeStack, SwarmStack
+
+
+@pytest.mark.parametrize("stack_type", [ComposeStack, SwarmStack])
+def test_stack_exec_quotes_list_of_args(stack_type):
+    executor = mock.Mock(spec=kitipy.Executor)
+    stack = stack_type(executor, stack_name='app', file='docker-compose.yml')
+
+    stack.exec('php', ['sh', '-c', 'echo "$HOME"'], user='www-data')
+
+    assert executor.run.call_args[0][0] == \
+        "docker-compose exec --user=www-data php sh -c 'echo \"$HOME\"'"
+
+
+@pytest.mark.parametrize("stack_type", [ComposeStack, SwarmStack])
+def test_stack_run_keeps_string_commands_as_is(stack_type):
+    executor = mock.Mock(spec=kitipy.Executor)
+    stack = stack_type(executor, stack_name='app', file='docker-compose.yml')
+
+    stack.run('php', 'bin/console cache:clear && echo done')
+
+    assert executor.run.call_args[0][0] == \
+        'docker-compose run --rm php bin/console cache:clear && echo done'
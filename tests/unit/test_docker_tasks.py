@@ -0,0 +1,105 @@
+import kitipy
+import pytest
+import subprocess
+from unittest import mock
+from kitipy.docker import tasks
+
+
+@pytest.fixture
+def kctx():
+    return mock.Mock(spec=kitipy.Context)
+
+
+@pytest.fixture
+def registry_manifest_exists():
+    """Make the registry API unable to tell whether images exist, unless the
+    test says otherwise.
+    """
+    with mock.patch('kitipy.docker.actions.registry_manifest_exists',
+                    return_value=None) as manifest_exists:
+        yield manifest_exists
+
+
+@pytest.fixture
+def inspect_many():
+    with mock.patch('kitipy.docker.actions.buildx_imagetools_inspect_many'
+                    ) as inspect_many:
+        yield inspect_many
+
+
+def test_validate_tag_checks_every_service_image_with_the_given_tag(
+        kctx, registry_manifest_exists, inspect_many):
+    kctx.stack.config = {
+        'services': {
+            'app': {
+                'image': 'localhost:5000/app:dev'
+            },
+            'web': {
+                'image': 'web'
+            },
+            'db': {
+                'build': '.'
+            },
+        }
+    }
+    inspect_many.return_value = [
+        subprocess.CompletedProcess('', 0),
+        subprocess.CompletedProcess('', 1),
+    ]
+
+    tasks.validate_tag(kctx, '1.0')
+
+    inspect_many.assert_called_once_with(
+        ['localhost:5000/app:1.0', 'web:1.0'], _check=False)
+    kctx.fail.assert_called_once_with(
+        'Image web:1.0 not found on remote registry.')
+
+
+def test_validate_tag_only_inspects_images_unknown_to_the_registry_api(
+        kctx, registry_manifest_exists, inspect_many):
+    kctx.stack.config = {
+        'services': {
+            'app': {
+                'image': 'app'
+            },
+            'worker': {
+                'image': 'app'
+            },
+            'web': {
+                'image': 'private.example.com/web'
+            },
+        }
+    }
+    registry_manifest_exists.side_effect = [True, None]
+    inspect_many.return_value = [subprocess.CompletedProcess('', 0)]
+
+    tasks.validate_tag(kctx, '1.0')
+
+    registry_manifest_exists.assert_has_calls(
+        [mock.call('app:1.0'),
+         mock.call('private.example.com/web:1.0')])
+    inspect_many.assert_called_once_with(['private.example.com/web:1.0'],
+                                         _check=False)
+    kctx.fail.assert_not_called()
+
+
+def test_validate_tag_fails_when_local_docker_cannot_find_an_image(
+        kctx, registry_manifest_exists, docker_stub):
+    kctx.stack.config = {
+        'services': {
+            'app': {
+                'image': 'app'
+            },
+            'web': {
+                'image': 'missing'
+            },
+        }
+    }
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+
+    with mock.patch('kitipy.docker.actions.get_current_executor',
+                    return_value=executor):
+        tasks.validate_tag(kctx, '1.0')
+
+    kctx.fail.assert_called_once_with(
+        'Image missing:1.0 not found on remote registry.')
@@ -0,0 +1,22 @@
+import click
+import io
+import kitipy
+
+
+def test_task_error_show_outputs_styled_message():
+    out = io.StringIO()
+    click_ctx = click.Context(click.Command('root'), color=True)
+
+    kitipy.TaskError('Something failed.', click_ctx).show(file=out)
+
+    assert out.getvalue() == click.style(
+        'Error: Something failed.', fg='bright_white', bg='red') + '\n'
+
+
+def test_task_error_show_strips_style_when_color_is_disabled():
+    out = io.StringIO()
+    click_ctx = click.Context(click.Command('root'), color=False)
+
+    kitipy.TaskError('Something failed.', click_ctx).show(file=out)
+
+    assert out.getvalue() == 'Error: Something failed.\n'
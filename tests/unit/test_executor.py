@@ -1,3 +1,4 @@
+import gc
 import kitipy
 import os.path
 import paramiko
@@ -5,18 +6,20 @@ import pathlib
 import pytest
 import shutil
 import socket
+import subprocess
 import tempfile
 from kitipy import InteractiveWarningPolicy
 from unittest import mock
 
 
+_SSH_CONFIG_FILE = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '.ssh', 'config'))
+
+
 @pytest.fixture(params=["local", "remote", "remote_with_jumphost"])
 def executor(request):
     dispatcher = kitipy.Dispatcher()
-
-    ssh_config_file = os.path.join(os.path.dirname(__file__), '..', '.ssh',
-                                   'config')
-    ssh_config_file = os.path.abspath(ssh_config_file)
+    ssh_config_file = _SSH_CONFIG_FILE
 
     if request.param == "local":
         basedir = tempfile.mkdtemp()
@@ -39,6 +42,40 @@ def executor(request):
     yield executor
 
 
+@pytest.fixture
+def dispatcher():
+    return mock.Mock(spec=kitipy.Dispatcher)
+
+
+@pytest.fixture
+def ssh_executor(dispatcher):
+    """Return a function creating executors for testhost. No connection is
+    opened until the test uses the ssh/sftp properties.
+    """
+    def create(**kwargs):
+        return kitipy.Executor(dispatcher,
+                               hostname='testhost',
+                               ssh_config_file=_SSH_CONFIG_FILE,
+                               **kwargs)
+
+    return create
+
+
+@pytest.fixture
+def ssh_executor_running_scripts_locally(dispatcher, ssh_executor):
+    """Like ssh_executor but the executors run the scripts sent over SSH
+    locally.
+    """
+    def create(**kwargs):
+        executor = ssh_executor(**kwargs)
+        executor._remote = mock.Mock(
+            side_effect=lambda script, **kwargs: kitipy.Executor(dispatcher).
+            local(script, pipe=True, check=False))
+        return executor
+
+    return create
+
+
 def executors_run_testdata():
     return (("echo yolo", 0, "yolo\n", ""), ("/bin/false", 1, "", ""),
             ("echo yolo >&2", 0, "", "yolo\n"))
@@ -98,3 +135,401 @@ def test_interactive_warning_policy_refused():
         confirm.assert_called_once()
         client._host_keys.add.assert_not_called()
         client.save_host_keys.assert_not_called()
+
+
+def test_executor_local_runs_list_of_args_without_shell():
+    executor = kitipy.Executor(kitipy.Dispatcher())
+
+    returned = executor.local(['echo', 'foo bar', '$HOME'],
+                              shell=False,
+                              pipe=True)
+
+    assert returned.stdout == "foo bar $HOME\n"
+
+
+def test_executor_copy_uploads_local_file_relative_to_local_basedir(
+        tmp_path, dispatcher, ssh_executor):
+    executor = ssh_executor(local_basedir=str(tmp_path), remote_basedir='/app')
+    executor._sftp = mock.Mock(spec=paramiko.SFTPClient)
+
+    (tmp_path / 'foo.txt').write_text('some content')
+    executor.copy('foo.txt', 'bar.txt')
+
+    args, kwargs = executor._sftp.putfo.call_args
+    assert args[0].name == str(tmp_path / 'foo.txt')
+    assert args[1] == '/app/bar.txt'
+    assert kwargs['file_size'] == len('some content')
+    dispatcher.emit.assert_any_call('file_transfer.start',
+                                    size=len('some content'),
+                                    label='Transfer foo.txt to bar.txt')
+    dispatcher.emit.assert_called_with('file_transfer.end')
+
+
+def test_executor_reopens_ssh_connection_closed_by_server(ssh_executor):
+    executor = ssh_executor()
+    stale_client = mock.Mock(spec=paramiko.SSHClient)
+    stale_client.get_transport.return_value.is_active.return_value = False
+    executor._ssh = stale_client
+
+    with mock.patch('paramiko.SSHClient') as ssh_client_cls:
+        client = executor.ssh
+
+    stale_client.close.assert_called_once_with()
+    assert client is ssh_client_cls.return_value
+    client.get_transport.return_value.set_keepalive.assert_called_once_with(
+        30)
+
+
+def test_executor_run_batch_sends_commands_as_a_single_script(
+        ssh_executor_running_scripts_locally):
+    executor = ssh_executor_running_scripts_locally()
+
+    results = executor.run_batch(
+        ['echo foo', ['printf', '%s', 'bar baz'], 'echo err >&2; exit 3'],
+        check=False)
+
+    executor._remote.assert_called_once()
+    assert [(res.args, res.returncode, res.stdout, res.stderr)
+            for res in results] == [
+                ('echo foo', 0, 'foo\n', ''),
+                ("printf %s 'bar baz'", 0, 'bar baz', ''),
+                ('echo err >&2; exit 3', 3, '', 'err\n'),
+            ]
+
+
+def test_executor_run_batch_stops_at_first_failure(
+        ssh_executor_running_scripts_locally):
+    executor = ssh_executor_running_scripts_locally()
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        executor.run_batch(['exit 2', 'echo foo'])
+
+    assert excinfo.value.returncode == 2
+    assert excinfo.value.cmd == 'exit 2'
+
+
+def test_executor_run_batch_fails_when_the_script_is_cut_off(
+        ssh_executor_running_scripts_locally):
+    executor = ssh_executor_running_scripts_locally()
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        executor.run_batch(['echo foo', 'kill -9 $$', 'echo bar'], check=False)
+
+    assert excinfo.value.returncode != 0
+    assert 'kill -9 $$' in excinfo.value.cmd
+
+
+def test_executor_run_batch_runs_commands_from_the_ssh_basedir(
+        tmp_path, ssh_executor_running_scripts_locally):
+    executor = ssh_executor_running_scripts_locally(
+        remote_basedir=str(tmp_path))
+
+    results = executor.run_batch(['pwd', 'cd / && pwd', 'pwd'])
+
+    assert [res.stdout for res in results] == [
+        '%s\n' % (tmp_path), '/\n', '%s\n' % (tmp_path)
+    ]
+    assert executor._remote.call_args[1]['cwd'] == ''
+
+
+def test_executor_run_batch_fails_when_the_ssh_basedir_is_missing(
+        tmp_path, ssh_executor_running_scripts_locally):
+    executor = ssh_executor_running_scripts_locally(
+        remote_basedir=str(tmp_path / 'missing'))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        executor.run_batch(['pwd', 'pwd'], check=False)
+
+
+def test_executor_run_batch_runs_commands_one_by_one_in_local_mode():
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+
+    results = executor.run_batch(['echo foo', 'exit 1'], check=False)
+
+    assert [(res.returncode, res.stdout) for res in results] == [(0, 'foo\n'),
+                                                                (1, '')]
+
+
+def test_executor_run_batch_runs_lists_of_args_without_shell_in_local_mode():
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+
+    results = executor.run_batch(
+        [['sh', '-c', 'exit 3'], ['echo', 'foo bar']], check=False)
+
+    assert [(res.returncode, res.stdout) for res in results] == [
+        (3, ''), (0, 'foo bar\n')
+    ]
+
+
+def test_executor_path_exists_stats_paths_through_sftp(ssh_executor):
+    executor = ssh_executor(remote_basedir='/srv/app')
+    executor._sftp = mock.Mock(spec=paramiko.SFTPClient)
+    executor._sftp.stat.side_effect = [
+        paramiko.SFTPAttributes(),
+        FileNotFoundError(2, 'No such file'),
+        paramiko.SFTPAttributes(),
+    ]
+
+    assert executor.path_exists('/etc/passwd') is True
+    assert executor.path_exists('/not/found') is False
+    assert executor.path_exists('shared/.env') is True
+    executor._sftp.stat.assert_has_calls([
+        mock.call('/etc/passwd'),
+        mock.call('/not/found'),
+        mock.call('/srv/app/shared/.env'),
+    ])
+
+
+def test_executor_runs_ssh_commands_from_the_basedir_in_a_single_channel(
+        ssh_executor):
+    executor = ssh_executor(remote_basedir='/srv/my app')
+    client = mock.Mock(spec=paramiko.SSHClient)
+    # Stop as soon as the command is sent, this test doesn't read its output.
+    client.exec_command.side_effect = paramiko.SSHException()
+
+    with mock.patch.object(kitipy.Executor,
+                           'ssh',
+                           new_callable=mock.PropertyMock,
+                           return_value=client):
+        with pytest.raises(paramiko.SSHException):
+            executor.run('ls -l')
+
+    client.exec_command.assert_called_once_with("cd '/srv/my app' && ls -l",
+                                                environment=None)
+
+
+def test_executor_buffers_ssh_output_chunks_as_bytes():
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+    channel = mock.Mock(spec=paramiko.Channel)
+    channel.in_buffer = b'..'
+    channel.in_stderr_buffer = b'.'
+    channel.recv_ready.return_value = True
+    channel.recv_stderr_ready.return_value = True
+    # "é" is split over two chunks.
+    channel.recv.side_effect = [b'caf\xc3', b'\xa9\n']
+    channel.recv_stderr.side_effect = [b'e', b'rr']
+
+    stdout = bytearray()
+    stderr = bytearray()
+    handlers = kitipy.executor._output_handlers(True, stdout, stderr)
+    executor._read_ssh_chunks(channel, *handlers)
+    executor._read_ssh_chunks(channel, *handlers)
+
+    assert stdout.decode('utf-8') == 'café\n'
+    assert stderr == b'err'
+
+
+def test_executor_writes_ssh_output_chunks_as_is_when_not_piped(capfdbinary):
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher))
+    channel = mock.Mock(spec=paramiko.Channel)
+    channel.in_buffer = b'.'
+    channel.recv_ready.return_value = True
+    channel.recv_stderr_ready.return_value = False
+    channel.recv.side_effect = [b'caf\xc3', b'\xa9\n']
+
+    stdout = bytearray()
+    handlers = kitipy.executor._output_handlers(False, stdout, bytearray())
+    executor._read_ssh_chunks(channel, *handlers)
+    executor._read_ssh_chunks(channel, *handlers)
+
+    assert stdout == b''
+    assert capfdbinary.readouterr().out == b'caf\xc3\xa9\n'
+
+
+def test_executor_parses_each_ssh_config_file_once(tmp_path):
+    ssh_config_file = tmp_path / 'config'
+    ssh_config_file.write_text('Host foo\n  HostName foo.example.com\n')
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+
+    with mock.patch('paramiko.SSHConfig.parse',
+                    autospec=True,
+                    side_effect=paramiko.SSHConfig.parse) as parse:
+        first = kitipy.Executor(dispatcher,
+                                hostname='foo',
+                                ssh_config_file=str(ssh_config_file))
+        second = kitipy.Executor(dispatcher,
+                                 hostname='foo',
+                                 ssh_config_file=str(ssh_config_file))
+
+        ssh_config_file.write_text(
+            'Host foo\n  HostName foo.example.com\n  Port 2222\n')
+        third = kitipy.Executor(dispatcher,
+                                hostname='foo',
+                                ssh_config_file=str(ssh_config_file))
+
+    assert parse.call_count == 2
+    assert first._ssh_config['hostname'] == 'foo.example.com'
+    assert second._ssh_config['hostname'] == 'foo.example.com'
+    assert third._ssh_config['port'] == '2222'
+
+
+def test_executor_copy_many_spreads_files_over_sftp_channels(
+        tmp_path, dispatcher, ssh_executor):
+    executor = ssh_executor(local_basedir=str(tmp_path),
+                            remote_basedir='/srv/app')
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(b'x' * 10)
+
+    sftp_clients = [
+        mock.Mock(spec=paramiko.SFTPClient),
+        mock.Mock(spec=paramiko.SFTPClient)
+    ]
+    for sftp in sftp_clients:
+        sftp.putfo.side_effect = lambda fl, remote, file_size, callback: \
+            callback(file_size, file_size)
+    client = mock.Mock(spec=paramiko.SSHClient)
+    client.open_sftp.side_effect = sftp_clients
+
+    with mock.patch.object(kitipy.Executor,
+                           'ssh',
+                           new_callable=mock.PropertyMock,
+                           return_value=client):
+        executor.copy_many([('a', 'a'), ('b', 'b'), ('c', '/tmp/c')],
+                           parallelism=2)
+
+    remote_paths = sorted(call[0][1] for sftp in sftp_clients
+                          for call in sftp.putfo.call_args_list)
+    assert remote_paths == ['/srv/app/a', '/srv/app/b', '/tmp/c']
+    for sftp in sftp_clients:
+        sftp.close.assert_called_once_with()
+
+    events = dispatcher.emit.call_args_list
+    assert events[0] == mock.call('file_transfer.start',
+                                  size=30,
+                                  label='Transfer 3 files')
+    assert events[-2] == mock.call('file_transfer.update',
+                                   current=30,
+                                   total=30)
+    assert events[-1] == mock.call('file_transfer.end')
+
+
+def test_executor_copy_many_closes_opened_channels_when_one_is_refused(
+        tmp_path, dispatcher, ssh_executor):
+    executor = ssh_executor(local_basedir=str(tmp_path))
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(b'x')
+
+    sftp = mock.Mock(spec=paramiko.SFTPClient)
+    client = mock.Mock(spec=paramiko.SSHClient)
+    client.open_sftp.side_effect = [
+        sftp, paramiko.ChannelException(1, 'Administratively prohibited')
+    ]
+
+    with mock.patch.object(kitipy.Executor,
+                           'ssh',
+                           new_callable=mock.PropertyMock,
+                           return_value=client):
+        with pytest.raises(paramiko.ChannelException):
+            executor.copy_many([('a', 'a'), ('b', 'b'), ('c', 'c')],
+                               parallelism=3)
+
+    sftp.close.assert_called_once_with()
+    sftp.putfo.assert_not_called()
+    dispatcher.emit.assert_not_called()
+
+
+def test_executor_mkdtemp_over_ssh_returns_the_path_without_newline(
+        ssh_executor):
+    executor = ssh_executor()
+    executor._remote = mock.Mock(return_value=subprocess.CompletedProcess(
+        '', 0, '/srv/tmp/build.AbCdEfGh\n', ''))
+
+    path = executor.mkdtemp(prefix='build.', dir='/srv/tmp')
+
+    assert path == '/srv/tmp/build.AbCdEfGh'
+    executor._remote.assert_called_once_with(
+        ['mktemp', '-d', '/srv/tmp/build.XXXXXXXX'], pipe=True)
+
+
+def test_executor_parses_known_hosts_once(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    (tmp_path / '.ssh').mkdir()
+    known_hosts = tmp_path / '.ssh' / 'known_hosts'
+    known_hosts.write_text('')
+
+    with mock.patch('paramiko.HostKeys.load', autospec=True) as load:
+        first = kitipy.executor._load_system_host_keys()
+        second = kitipy.executor._load_system_host_keys()
+        known_hosts.write_text('\n')
+        third = kitipy.executor._load_system_host_keys()
+
+    assert first is second
+    assert third is not first
+    assert load.call_count == 2
+
+
+def test_executor_loads_empty_host_keys_without_known_hosts(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    assert len(kitipy.executor._load_system_host_keys()) == 0
+
+
+def test_executor_throttles_file_transfer_updates():
+    dispatcher = mock.Mock(spec=kitipy.Dispatcher)
+    total = 1000 * 1024 * 1024
+    update = kitipy.executor._progress_emitter(dispatcher, total)
+
+    for current in range(32 * 1024, total + 1, 32 * 1024):
+        update(current)
+
+    updates = dispatcher.emit.call_args_list
+    assert len(updates) == 100
+    assert updates[-1] == mock.call('file_transfer.update',
+                                    current=total,
+                                    total=total)
+
+
+@pytest.mark.parametrize('basedir,path,expected', [
+    (None, 'foo', 'foo'),
+    ('/app', 'foo/bar', '/app/foo/bar'),
+    ('/app/', 'foo', '/app/foo'),
+    ('/', 'foo', '/foo'),
+    ('/app', '/etc/foo', '/etc/foo'),
+])
+def test_resolve_path(basedir, path, expected):
+    assert kitipy.executor._resolve_path(basedir, path) == expected
+
+
+def test_executor_closes_ssh_connection_when_used_as_context_manager(
+        ssh_executor):
+    with mock.patch('paramiko.SSHClient') as ssh_client_cls:
+        with ssh_executor() as executor:
+            client = executor.ssh
+
+    client.close.assert_called_once_with()
+    assert executor._ssh is None
+
+
+def test_executor_closes_ssh_connection_when_garbage_collected(ssh_executor):
+    executor = ssh_executor()
+
+    with mock.patch('paramiko.SSHClient') as ssh_client_cls:
+        client = executor.ssh
+
+    del executor
+    gc.collect()
+
+    client.close.assert_called_once_with()
+
+
+def test_executor_path_exists_resolves_relative_paths_after_cd(tmp_path):
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'foo').write_text('')
+    executor = kitipy.Executor(mock.Mock(spec=kitipy.Dispatcher),
+                               local_basedir=str(tmp_path))
+
+    assert executor.path_exists('foo') is False
+    with executor.cd('app'):
+        assert executor.path_exists('foo') is True
+        assert executor.local('ls foo', pipe=True).stdout == 'foo\n'
+
+
+def test_executor_path_exists_stats_relative_paths_from_the_cd_directory(
+        ssh_executor):
+    executor = ssh_executor(remote_basedir='/srv')
+    executor._sftp = mock.Mock(spec=paramiko.SFTPClient)
+
+    with executor.cd('app'):
+        assert executor.path_exists('foo') is True
+
+    executor._sftp.stat.assert_called_once_with('/srv/app/foo')
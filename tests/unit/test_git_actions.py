@@ -0,0 +1,66 @@
+import kitipy
+import subprocess
+from unittest import mock
+from kitipy import git_actions
+
+
+def test_ensure_tag_exists_checks_origin_then_local_repo():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.local.return_value = subprocess.CompletedProcess('', 0)
+
+    git_actions.ensure_tag_exists(kctx, 'v1.0')
+
+    kctx.local.assert_has_calls([
+        mock.call([
+            'git', 'ls-remote', '--exit-code', '--tags', 'origin',
+            'refs/tags/v1.0'
+        ],
+                  shell=False,
+                  pipe=True,
+                  check=False),
+        mock.call(['git', 'show-ref', '--verify', '--quiet', 'refs/tags/v1.0'],
+                  shell=False,
+                  pipe=True,
+                  check=False),
+    ])
+    kctx.fail.assert_not_called()
+
+
+def test_ensure_tag_exists_fails_when_local_repo_lacks_the_tag():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.local.side_effect = [
+        subprocess.CompletedProcess('', 0),
+        subprocess.CompletedProcess('', 1),
+    ]
+
+    git_actions.ensure_tag_exists(kctx, 'v1.0')
+
+    kctx.fail.assert_called_once()
+    assert 'local Git repo' in kctx.fail.call_args[0][0]
+
+
+def test_ensure_tag_is_recent_looks_for_the_tag_among_the_last_ones():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.local.return_value = subprocess.CompletedProcess('', 0,
+                                                          'v1.2.1\nv1.2\n')
+
+    git_actions.ensure_tag_is_recent(kctx, 'v1.2', last=2)
+
+    kctx.local.assert_called_once_with([
+        'git', 'for-each-ref', '--format=%(refname:strip=2)',
+        '--sort=-committerdate', '--count=2', 'refs/tags/*'
+    ],
+                                       shell=False,
+                                       pipe=True,
+                                       check=False)
+    kctx.fail.assert_not_called()
+
+
+def test_ensure_tag_is_recent_fails_on_partial_tag_matches():
+    kctx = mock.Mock(spec=kitipy.Context)
+    kctx.local.return_value = subprocess.CompletedProcess('', 0,
+                                                          'v1.2.1\nv1.2.0\n')
+
+    git_actions.ensure_tag_is_recent(kctx, 'v1.2', last=2)
+
+    kctx.fail.assert_called_once()
@@ -487,3 +487,82 @@ def test_invoking_a_stacks_group_is_not_supported(click_ctx):
 
     with pytest.raises(RuntimeError):
         stacks.invoke(click_ctx)
+
+
+def test_group_list_commands_sorts_resolved_commands_once(click_ctx):
+    root = kitipy.Group('root')
+    root.add_command(kitipy.Task('foo', callback=lambda: ()))
+    root.add_command(kitipy.Task('bar', callback=lambda: ()))
+
+    names = root.list_commands(click_ctx)
+
+    assert names == ['bar', 'foo']
+    assert root.list_commands(click_ctx) is names
+
+
+def test_group_without_commands_is_resolved_once(click_ctx):
+    root = kitipy.Group('root')
+    transparent = mock.Mock(spec=click.MultiCommand)
+    transparent.name = 'transparent'
+    transparent.list_commands.return_value = []
+    root.add_transparent_group(transparent)
+
+    assert root.list_commands(click_ctx) == []
+    assert root.get_command(click_ctx, 'foo') is None
+
+    transparent.list_commands.assert_called_once_with(click_ctx)
+    with pytest.raises(RuntimeError):
+        root.add_command(kitipy.Task('foo', callback=lambda: ()))
+
+
+def test_group_list_commands_reports_where_colliding_commands_come_from():
+    foo = kitipy.Task(name='foo')
+    acme = kitipy.Group(name='acme', tasks=[foo])
+    plop = kitipy.Group(name='plop', tasks=[foo])
+
+    root = kitipy.Group(transparents=[acme, plop])
+
+    click_ctx = click.Context(root)
+    with pytest.raises(RuntimeError,
+                       match='"plop" adds command\\(s\\) colliding with: "foo" from "acme"'):
+        root.list_commands(click_ctx)
+
+
+def test_group_help_lists_commands_by_origin():
+    root = kitipy.Group('root')
+    root.add_command(click.Command('plain', help='Plain command'))
+    root.add_command(kitipy.Task('foo', help='Foo task'))
+    acme = kitipy.Group('acme', tasks=[kitipy.Task('bar', help='Bar task')])
+    root.add_transparent_group(acme)
+
+    formatter = click.HelpFormatter()
+    root.format_commands(click.Context(root), formatter)
+
+    assert formatter.getvalue().splitlines() == [
+        'acme:',
+        '  bar  Bar task',
+        '',
+        'Commands:',
+        '  foo    Foo task',
+        '  plain  Plain command',
+    ]
+
+
+def test_root_command_selects_the_default_stage_and_the_only_stack():
+    root = kitipy.RootCommand({
+        'stages': {
+            'dev': {
+                'type': 'local'
+            },
+            'prod': {
+                'type': 'local',
+                'default': True
+            },
+        },
+        'stacks': {
+            'app': {}
+        },
+    })
+
+    assert root.stage == 'prod'
+    assert root.stack == 'app'
@@ -1,7 +1,7 @@
 import kitipy
 import os
 import pytest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 from kitipy import *
 
 
@@ -25,6 +25,12 @@ def append_cmd_flags_testdata():
         ("foo", {
             "some-float": 3.141592
         }, "foo --some-float=3.141592"),
+        ("foo", {
+            "d": True,
+            "skipped": None,
+            "t": ("a", "b"),
+            "some_flag": "bar",
+        }, "foo -d -t a -t b --some-flag=bar"),
     ]
 
 
@@ -144,3 +150,104 @@ def test_load_config_file():
     }
 
     assert config == expected
+
+
+def test_load_config_file_returns_a_new_copy_on_each_call():
+    filepath = os.path.join(os.path.dirname(__file__), "testdata/config.yml")
+
+    first = load_config_file(filepath)
+    first['stages']['dev']['type'] = 'remote'
+    second = load_config_file(filepath)
+
+    assert second['stages']['dev']['type'] == 'local'
+
+
+def test_load_config_file_reloads_modified_files(tmp_path):
+    filepath = str(tmp_path / "config.yml")
+    with open(filepath, 'w') as f:
+        f.write("stages:\n  dev:\n    type: local\n")
+
+    assert load_config_file(filepath)['stages']['dev']['type'] == 'local'
+
+    with open(filepath, 'w') as f:
+        f.write("stages:\n  prod:\n    type: remote\n")
+
+    assert 'prod' in load_config_file(filepath)['stages']
+
+
+def test_parallel_map():
+    config = {
+        'stages': {
+            'dev': {
+                'name': 'dev',
+                'type': 'local'
+            },
+            'prod': {
+                'name': 'prod',
+                'type': 'local'
+            },
+        },
+    }
+    dispatcher = Mock(spec=kitipy.Dispatcher)
+    kctx = kitipy.Context(config, Mock(spec=kitipy.Executor), dispatcher)
+
+    def fn(stage_kctx):
+        assert stage_kctx is not kctx
+        assert stage_kctx.executor is not kctx.executor
+        return stage_kctx.stage['name']
+
+    assert parallel_map(kctx, fn, ['prod', 'dev']) == ['prod', 'dev']
+    assert parallel_map(kctx, fn, []) == []
+
+
+def append_cmd_args_testdata():
+    return [
+        (["foo"], {
+            "d": True
+        }, ["foo", "-d"]),
+        (["foo"], {
+            "f": "config.yaml"
+        }, ["foo", "-f", "config.yaml"]),
+        (["foo"], {
+            "some": "flag with spaces"
+        }, ["foo", "--some=flag with spaces"]),
+        (["foo"], {
+            "filter": ("a", "b")
+        }, ["foo", "--filter=a", "--filter=b"]),
+        (["foo"], {
+            "some_bool": True,
+            "skipped": None
+        }, ["foo", "--some-bool"]),
+        (["foo"], {
+            "some-float": 3.141592
+        }, ["foo", "--some-float=3.141592"]),
+    ]
+
+
+@pytest.mark.parametrize("args, flags, expected", append_cmd_args_testdata())
+def test_append_cmd_args(args, flags, expected):
+    returned = append_cmd_args(args, **flags)
+    assert returned == expected
+    assert args != expected
+
+
+def test_functools_pipe():
+    import kitipy.functools
+
+    assert kitipy.functools.pipe(lambda: 2) == 2
+    assert kitipy.functools.pipe(lambda: 2, lambda x: x + 1,
+                                 lambda x: x * 10) == 30
+
+
+def test_parallel_map_closes_stage_executors():
+    config = {'stages': {'prod': {'name': 'prod', 'type': 'local'}}}
+    kctx = kitipy.Context(config, Mock(spec=kitipy.Executor),
+                          Mock(spec=kitipy.Dispatcher))
+
+    with patch('kitipy.utils._create_executor') as create_executor:
+        stage_executor = Mock(spec=kitipy.Executor)
+        create_executor.return_value = stage_executor
+
+        parallel_map(kctx, lambda stage_kctx: None, ['prod'])
+
+    stage_executor.close.assert_called_once_with()